@@ -53,5 +53,6 @@ awesometts.config_menu()       # provides access to configuration dialog
 awesometts.editor_button()     # single audio clip generator button
 awesometts.reviewer_hooks()    # on-the-fly playback/shortcuts, context menus
 awesometts.temp_files()        # remove temporary files upon session exit
+awesometts.worker_threads()    # stop background worker threads upon session exit
 awesometts.register_tts_tag()  # register AwesomeTTS "voices" for the anki {{tts}} tag
 awesometts.display_homescreen() # display AwesomeTTS welcome screen
@@ -31,6 +31,7 @@ import aqt.qt
 
 from . import conversion as to, gui, paths, service
 from .bundle import Bundle
+from .cache import Cache, Failures
 from .config import Config
 from .player import Player
 from .router import Router
@@ -104,21 +105,25 @@ if 'AWESOMETTS_DEBUG_LOGGING' in os.environ:
     logger.setLevel(logging.DEBUG)
 else:
     logger = Bundle(debug=lambda *a, **k: None, error=lambda *a, **k: None,
-                    info=lambda *a, **k: None, warn=lambda *a, **k: None)
+                    info=lambda *a, **k: None, warn=lambda *a, **k: None,
+                    warning=lambda *a, **k: None)
 
 config = Config(
     db=Bundle(path=paths.CONFIG,
               table='general',
               normalize=to.normalized_ascii),
     cols=[
+        ('batch_concurrency', 'integer', 0, int, int),
         ('cache_days', 'integer', 365, int, int),
+        ('cache_max_mb', 'integer', 0, int, int),
         ('ellip_note_newlines', 'integer', False, to.lax_bool, int),
         ('ellip_template_newlines', 'integer', False, to.lax_bool, int),
         ('extras', 'text', {}, to.deserialized_dict, to.compact_json),
+        ('failure_ttls', 'text', {}, to.deserialized_dict, to.compact_json),
         ('filenames', 'text', 'hash', str, str),
         ('filenames_human', 'text',
          '{{text}} ({{service}} {{voice}})', str, str),
-        ('groups', 'text', {}, to.deserialized_dict, to.compact_json),
+        ('groups', 'keyed', {}, to.deserialized_dict, to.compact_json),
         ('homescreen_last_preset', 'text', '', str, str),
         ('homescreen_show', 'integer', True, to.lax_bool, int),
         ('lame_flags', 'text', '--quiet -q 2', str, str),
@@ -131,15 +136,18 @@ config = Config(
                                   else 'say' if 'darwin' in sys.platform
                                   else 'yandex'), str, str),
         ('last_strip_mode', 'text', 'ours', str, str),
+        ('long_text_limit', 'integer', 0, int, int),
+        ('long_text_sentences', 'integer', False, to.lax_bool, int),
         ('shortcut_launch_browser_generator', 'text', 'Ctrl+T', str, str),
         ('shortcut_launch_browser_stripper', 'text', 'Ctrl+T', str, str),
         ('shortcut_launch_configurator', 'text', 'Ctrl+T', str, str),
         ('shortcut_launch_editor_generator', 'text', 'Ctrl+T', str, str),
         ('shortcut_launch_templater', 'text', 'Ctrl+T', str, str),
         ('otf_only_revealed_cloze', 'integer', False, to.lax_bool, int),
+        ('otf_prefetch', 'integer', 0, int, int),
         ('otf_remove_hints', 'integer', False, to.lax_bool, int),
         ('plus_api_key', 'text', '', str, str),
-        ('presets', 'text', {}, to.deserialized_dict, to.compact_json),
+        ('presets', 'keyed', {}, to.deserialized_dict, to.compact_json),
         ('service_azure_sleep_time', 'integer', 0, int, int),
         ('service_forvo_preferred_users', 'text', '', str, str),
         ('spec_note_count', 'text', '', str, str),
@@ -166,7 +174,8 @@ config = Config(
          to.substitution_json),
         ('throttle_sleep', 'integer', 30, int, int),
         ('throttle_threshold', 'integer', 10, int, int),
-        ('tts_voices', 'text', {}, to.deserialized_dict, to.compact_json),
+        ('tts_voices', 'keyed', {}, to.deserialized_dict, to.compact_json),
+        ('worker_threads', 'integer', 8, int, int),
     ],
     logger=logger,
     events=[
@@ -198,6 +207,16 @@ player = Player(
     logger=logger,
 )
 
+cache = Cache(
+    directory=paths.CACHE,
+    index=paths.CACHE_INDEX,
+    logger=logger,
+    budget=lambda: config['cache_max_mb'] * 1048576,
+    days=lambda: config['cache_days'],
+)
+
+failures = Failures(index=paths.CACHE_INDEX, logger=logger)
+
 router = Router(
     services=Bundle(
         mappings=[
@@ -256,7 +275,8 @@ router = Router(
                     languagetools=languagetools,
                     config=config),
     ),
-    cache_dir=paths.CACHE,
+    cache=cache,
+    failures=failures,
     temp_dir=join(paths.TEMP, '_awesometts_scratch_' + str(int(time()))),
     logger=logger,
     config=config,
@@ -299,6 +319,7 @@ addon = Bundle(
     language=service.languages.Language,
     languagetools=languagetools,
     logger=logger,
+    cache=cache,
     paths=Bundle(cache=paths.CACHE,
                  is_link=paths.ADDON_IS_LINKED),
     player=player,
@@ -333,11 +354,13 @@ addon = Bundle(
         ], config=config, logger=logger),
 
         # clean up fields coming from templates (on the fly TTS)
+        # (hint_links goes ahead of clozes_revealed so that it and
+        # hint_content, which need the HTML structure, run in one pass)
         from_template=Sanitizer([
             ('ruby_tags', 'strip_ruby_tags'),
             ('clozes_rendered', 'sub_template_cloze'),
-            ('clozes_revealed', 'otf_only_revealed_cloze'),
             'hint_links',
+            ('clozes_revealed', 'otf_only_revealed_cloze'),
             ('hint_content', 'otf_remove_hints'),
             ('newline_ellipsize', 'ellip_template_newlines'),
             'html',
@@ -473,43 +496,16 @@ def browser_menus():
 
 
 def cache_control():
-    """Registers a hook to handle cache control on session exits."""
-
-    def on_unload_profile():
-        """
-        Finds MP3s in the cache directory older than the user's
-        configured cache limit and attempts to remove them.
-        """
-
-        from os import listdir, unlink
-
-        cache = paths.CACHE
-
-        try:
-            filenames = listdir(cache)
-        except:  # allow silent failure, pylint:disable=bare-except
-            return
-        if not filenames:
-            return
-
-        prospects = (join(cache, filename) for filename in filenames)
-
-        if config['cache_days']:
-            from os.path import getmtime
-
-            limit = time() - 86400 * config['cache_days']
-            targets = (prospect for prospect in prospects
-                       if getmtime(prospect) < limit)
-        else:
-            targets = prospects
-
-        for target in targets:
-            try:
-                unlink(target)
-            except:  # skip broken files, pylint:disable=bare-except
-                pass
+    """
+    Registers hooks to start indexing the cache when a profile is
+    loaded, and to close the cache index, and write out and close the
+    configuration, on session exits.
+    """
 
-    anki.hooks.addHook('unloadProfile', on_unload_profile)
+    anki.hooks.addHook('profileLoaded', cache.start)
+    anki.hooks.addHook('unloadProfile', cache.close)
+    anki.hooks.addHook('unloadProfile', failures.close)
+    anki.hooks.addHook('unloadProfile', config.close)
 
 
 def cards_button():
@@ -816,6 +812,12 @@ def temp_files():
     anki.hooks.addHook('unloadProfile', on_unload_profile)
 
 
+def worker_threads():
+    """Stop the router's background worker threads upon session exit."""
+
+    anki.hooks.addHook('unloadProfile', router.shutdown)
+
+
 def register_tts_tag():
     register_tts_player(addon)
 
@@ -0,0 +1,712 @@
+# -*- coding: utf-8 -*-
+
+# AwesomeTTS text-to-speech add-on for Anki
+# Copyright (C) 2010-Present  Anki AwesomeTTS Development Team
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Audio cache bookkeeping
+
+Cached clips are named after a hash of their service, text, and options,
+so a given request always maps to the same file, and are spread over 256
+subdirectories keyed by the start of that hash so that no one directory
+grows too large to list or search quickly. An SQLite index next to
+the cache directory records each clip's size, last access, and hit count
+so that the cache can be held to a byte budget by evicting the least
+recently used clips, a batch at a time, from a background thread.
+
+Failed requests are remembered in the same database, each with its own
+expiry time, so that known failures (e.g. words missing from an online
+dictionary) are not requested again, even after a restart.
+"""
+
+import heapq
+import os
+import os.path
+import sqlite3
+from threading import Event, Lock, Thread
+from time import time
+
+from .service import NotFound
+
+__all__ = ['Cache', 'Failures']
+
+
+ADOPT_BATCH = 1000    # clips indexed per adoption transaction
+EVICT_BATCH = 250     # clips removed per eviction transaction
+EVICT_GRACE = 600     # seconds a clip is safe from eviction after each use
+EVICT_INTERVAL = 300  # seconds between housekeeping passes when idle
+SHARD_CHARS = 2       # leading hex digits of the hash naming a subdirectory
+FAILURES_LIMIT = 50000  # most failures remembered at once
+
+# exception types failures are rebuilt as when read back from the index;
+# others are stored as the nearest of these they derive from
+FAILURE_TYPES = {kind.__name__: kind
+                 for kind in [NotFound, OSError, ValueError, RuntimeError]}
+
+
+def _digest(filename):
+    """
+    Recovers the hex digest from a clip filename as built by the router
+    (e.g. "svc-01234567-89abcdef-....mp3"), or returns None.
+    """
+
+    digest = ''.join(os.path.splitext(filename)[0].split('-')[-5:])
+    if len(digest) != 40:
+        return None
+    try:
+        int(digest, 16)
+    except ValueError:
+        return None
+    return digest
+
+
+class Cache(object):
+    """
+    Exposes the cache directory along with its index.
+
+    Calls made from the main thread (hit() and add()) only record their
+    changes in memory; a housekeeping thread writes them to the index
+    and then evicts clips until the cache is back within its limits.
+    """
+
+    __slots__ = [
+        '_adopted',    # True once clips predating the index are indexed
+        '_budget',     # callable returning maximum cache size in bytes
+        '_conn',       # SQLite3 connection to the index, guarded by _lock
+        '_days',       # callable returning days a clip may go unused
+        '_dir',        # path of the directory holding cached clips
+        '_index',      # path of the SQLite3 index database
+        '_lock',       # guards _conn and _pending
+        '_logger',     # logger-like interface with debug(), info(), etc.
+        '_pending',    # dict of clip names to (size, accessed, hits) deltas
+        '_shards',     # set of subdirectories known to exist
+        '_sharded',    # True once flat-layout clips have been migrated
+        '_stopping',   # flag telling the housekeeping thread to finish
+        '_thread',     # housekeeping thread, if one is running
+        '_wake',       # event used to wake the housekeeping thread early
+    ]
+
+    def __init__(self, directory, index, logger, budget, days):
+        """
+        Given the cache directory, path to the index database, a logger,
+        and callables returning the byte budget and the number of days
+        a clip may go unused (zero meaning no limit for either), sets up
+        the cache. Nothing is read from disk until the first call or
+        until start() is called.
+        """
+
+        self._adopted = False
+        self._budget = budget
+        self._conn = None
+        self._days = days
+        self._dir = directory
+        self._index = index
+        self._lock = Lock()
+        self._logger = logger
+        self._pending = {}
+        self._shards = set()
+        self._sharded = False
+        self._stopping = False
+        self._thread = None
+        self._wake = Event()
+
+    @property
+    def directory(self):
+        """Returns the path of the cache directory."""
+
+        return self._dir
+
+    def path(self, filename, digest):
+        """
+        Returns the full path a clip with the given name is kept at,
+        using the hex digest the name was built from to pick (and, if
+        needed, create) its subdirectory.
+        """
+
+        shard = digest[:SHARD_CHARS]
+        if shard not in self._shards:
+            os.makedirs(os.path.join(self._dir, shard), exist_ok=True)
+            self._shards.add(shard)
+
+        return os.path.join(self._dir, shard, filename)
+
+    def exists(self, path):
+        """
+        Returns True if the given clip is cached. Until the one-time
+        migration to the sharded layout is done, a clip still sitting
+        in the top-level directory is moved into place on the spot.
+        """
+
+        if os.path.exists(path):
+            return True
+        if self._sharded:
+            return False
+
+        try:
+            os.replace(os.path.join(self._dir, os.path.basename(path)), path)
+        except OSError:
+            return False
+        return True
+
+    def hit(self, path):
+        """
+        Records that a cached clip was used. If the clip is not indexed
+        yet (e.g. it predates the index), it is adopted.
+        """
+
+        self._record(path, None)
+
+    def add(self, path):
+        """Records a clip that was just written into the cache."""
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+
+        self._record(path, size)
+
+    def start(self):
+        """
+        Starts the housekeeping thread, if it is not running already,
+        so that clips predating the index are adopted (e.g. at profile
+        load) without waiting for the first clip to be played.
+        """
+
+        if not self._thread:
+            self._thread = Thread(target=self._housekeeping,
+                                  name='AwesomeTTS cache', daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        """
+        Returns a dict with the number of clips, their total size in
+        bytes, the total number of hits, and the current byte budget.
+        While existing clips are still being adopted into the index,
+        'indexing' is True and the numbers only cover those done so far.
+        """
+
+        self.start()
+
+        with self._lock:
+            conn = self._connect()
+            self._flush(conn)
+            count, size, hits = conn.execute(
+                'SELECT COUNT(*), TOTAL(size), TOTAL(hits) FROM clips'
+            ).fetchone()
+
+        return dict(count=count, bytes=int(size), hits=int(hits),
+                    budget=self._budget(), indexing=not self._adopted)
+
+    def clear(self):
+        """
+        Deletes every cached clip, returning a tuple with the number of
+        clips that were and were not removed.
+        """
+
+        count_success = count_error = 0
+
+        with self._lock:
+            conn = self._connect()
+            self._pending.clear()
+
+            names = set(name for (name,) in
+                        conn.execute('SELECT name FROM clips'))
+            names.update(name for name, _ in self._walk())
+
+            removed = []
+            for name in names:
+                try:
+                    os.unlink(os.path.join(self._dir, name))
+                except FileNotFoundError:
+                    removed.append((name,))
+                except OSError:
+                    count_error += 1
+                else:
+                    removed.append((name,))
+                    count_success += 1
+
+            conn.executemany('DELETE FROM clips WHERE name = ?', removed)
+            conn.commit()
+
+        return count_success, count_error
+
+    def close(self):
+        """
+        Stops the housekeeping thread, writes out anything pending, and
+        closes the index, e.g. on profile unload. If the cache has been
+        configured with a zero-day limit, every clip is deleted instead.
+        The cache reopens itself if it is used again afterward.
+        """
+
+        thread = self._thread
+        if thread:
+            self._stopping = True
+            self._wake.set()
+            thread.join()
+            self._thread = None
+            self._stopping = False
+
+        if self._days() == 0:
+            self.clear()
+
+        with self._lock:
+            if self._conn:
+                self._flush(self._conn)
+                self._conn.close()
+                self._conn = None
+
+    def _record(self, path, size):
+        """Queues an index update and makes sure housekeeping runs."""
+
+        name = os.path.relpath(path, self._dir)
+        now = time()
+
+        with self._lock:
+            old_size, _, hits = self._pending.get(name, (None, None, 0))
+            self._pending[name] = (
+                old_size if size is None else size,
+                now,
+                hits if size is not None else hits + 1,
+            )
+
+        if not self._thread:
+            self.start()
+        elif size is not None:
+            self._wake.set()
+
+    def _connect(self):
+        """
+        Returns the index connection, opening and (if needed) building
+        it first. Must be called with the lock held.
+        """
+
+        if not self._conn:
+            conn = sqlite3.connect(self._index, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS clips ('
+                         'name TEXT PRIMARY KEY, '
+                         'size INTEGER NOT NULL, '
+                         'accessed REAL NOT NULL, '
+                         'hits INTEGER NOT NULL DEFAULT 0)')
+            conn.execute('CREATE INDEX IF NOT EXISTS clips_accessed '
+                         'ON clips (accessed)')
+            conn.execute('CREATE TABLE IF NOT EXISTS meta ('
+                         'key TEXT PRIMARY KEY, value TEXT)')
+            conn.commit()
+            self._conn = conn
+
+        return self._conn
+
+    def _flush(self, conn):
+        """
+        Writes queued hits and additions into the index. Must be called
+        with the lock held.
+        """
+
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        for name, (size, accessed, hits) in pending.items():
+            if size is not None:
+                conn.execute('INSERT OR REPLACE INTO clips '
+                             '(name, size, accessed, hits) VALUES (?,?,?,?)',
+                             (name, size, accessed, hits))
+                continue
+
+            if conn.execute('UPDATE clips SET accessed = ?, hits = hits + ? '
+                            'WHERE name = ?',
+                            (accessed, hits, name)).rowcount:
+                continue
+
+            try:
+                size = os.path.getsize(os.path.join(self._dir, name))
+            except OSError:
+                continue
+            conn.execute('INSERT OR IGNORE INTO clips '
+                         '(name, size, accessed, hits) VALUES (?,?,?,?)',
+                         (name, size, accessed, hits))
+
+        conn.commit()
+
+    def _adopt(self):
+        """
+        Indexes clips that were cached before the index existed, using
+        their modification time as the last access. This only happens
+        once per index. The directory is walked without the lock, which
+        is only taken to insert each batch, so that playback is never
+        held up for long, even with a very large cache.
+        """
+
+        with self._lock:
+            conn = self._connect()
+            if conn.execute("SELECT 1 FROM meta "
+                            "WHERE key = 'adopted'").fetchone():
+                self._adopted = True
+                return
+
+        count = 0
+        rows = []
+
+        def insert():
+            """Indexes the current batch of rows, leaving newer ones."""
+
+            with self._lock:
+                conn = self._connect()
+                conn.executemany('INSERT OR IGNORE INTO clips '
+                                 '(name, size, accessed) VALUES (?,?,?)',
+                                 rows)
+                conn.commit()
+
+        for name, stat in self._walk():
+            rows.append((name, stat.st_size, stat.st_mtime))
+            if len(rows) == ADOPT_BATCH:
+                insert()
+                count += len(rows)
+                rows = []
+            if self._stopping:
+                return  # resumes at the next start, skipping done rows
+
+        insert()
+        count += len(rows)
+
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('adopted', '1')")
+            conn.commit()
+            self._adopted = True
+
+        self._logger.debug("Adopted %d existing clips into cache index", count)
+
+    def _migrate(self):
+        """
+        Moves clips left in the top-level directory by older versions
+        into their subdirectories and renames them in the index. This
+        only happens once per index. The lock is only taken to update
+        the index, so playback is never held up by the file moves.
+        """
+
+        with self._lock:
+            conn = self._connect()
+            if conn.execute("SELECT 1 FROM meta "
+                            "WHERE key = 'sharded'").fetchone():
+                self._sharded = True
+                return
+
+        moved = []
+        try:
+            entries = [entry.name for entry in os.scandir(self._dir)
+                       if entry.is_file()]
+        except OSError:
+            entries = []
+
+        for filename in entries:
+            digest = _digest(filename)
+            if not digest:
+                continue
+            target = self.path(filename, digest)
+            try:
+                os.replace(os.path.join(self._dir, filename), target)
+            except OSError:
+                continue
+            moved.append((os.path.relpath(target, self._dir), filename))
+
+        with self._lock:
+            conn = self._connect()
+            conn.executemany('UPDATE OR REPLACE clips SET name = ? '
+                             'WHERE name = ?', moved)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('sharded', '1')")
+            conn.commit()
+            self._sharded = True
+
+        self._logger.debug("Moved %d clips into cache subdirectories",
+                           len(moved))
+
+    def _walk(self):
+        """
+        Yields the name (relative to the cache directory) and stat of
+        each file in the cache, both at the top level and one level of
+        subdirectories down.
+        """
+
+        try:
+            entries = list(os.scandir(self._dir))
+        except OSError:
+            return
+
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    yield entry.name, entry.stat()
+                elif entry.is_dir():
+                    for sub in os.scandir(entry.path):
+                        if sub.is_file():
+                            yield (os.path.join(entry.name, sub.name),
+                                   sub.stat())
+            except OSError:
+                continue
+
+    def _housekeeping(self):
+        """Thread body; flushes and evicts until asked to stop."""
+
+        while True:
+            try:
+                if not self._sharded:
+                    self._migrate()
+                if not self._adopted:
+                    self._adopt()
+
+                with self._lock:
+                    self._flush(self._connect())
+
+                while self._evict_batch():
+                    if self._stopping:
+                        break
+
+            except Exception as exception:  # all, pylint:disable=W0703
+                self._logger.error("Cache housekeeping failed: %s", exception)
+
+            if self._stopping:
+                return
+            self._wake.wait(EVICT_INTERVAL)
+            self._wake.clear()
+
+    def _evict_batch(self):
+        """
+        Removes one batch of clips that are past the day limit or, if
+        the cache is over budget, the least recently used ones. Returns
+        True if more clips may need to go.
+
+        Clips used within the last EVICT_GRACE seconds, or with a use
+        not yet written to the index, are never removed, so that a clip
+        the router or a generator is still working with (e.g. a segment
+        about to be joined) stays in place.
+
+        The lock is only held for one batch at a time so that stats()
+        and clear() are never held up for long.
+        """
+
+        budget = self._budget()
+        days = self._days()
+        now = time()
+
+        with self._lock:
+            conn = self._connect()
+            victims = []
+
+            if days:
+                victims = [
+                    (name, size)
+                    for name, size in conn.execute(
+                        'SELECT name, size FROM clips WHERE accessed < ? '
+                        'ORDER BY accessed LIMIT ?',
+                        (min(now - 86400 * days, now - EVICT_GRACE),
+                         EVICT_BATCH),
+                    )
+                    if name not in self._pending
+                ]
+
+            if not victims and budget:
+                excess = conn.execute(
+                    'SELECT TOTAL(size) FROM clips'
+                ).fetchone()[0] - budget
+
+                for name, size in conn.execute(
+                        'SELECT name, size FROM clips WHERE accessed < ? '
+                        'ORDER BY accessed LIMIT ?',
+                        (now - EVICT_GRACE, EVICT_BATCH)):
+                    if excess <= 0:
+                        break
+                    if name in self._pending:
+                        continue
+                    victims.append((name, size))
+                    excess -= size
+
+            if not victims:
+                return False
+
+            for name, _ in victims:
+                try:
+                    os.unlink(os.path.join(self._dir, name))
+                except FileNotFoundError:
+                    pass
+                except OSError as exception:
+                    self._logger.warning("Cannot evict %s: %s", name, exception)
+
+            conn.executemany('DELETE FROM clips WHERE name = ?',
+                             [(name,) for name, _ in victims])
+            conn.commit()
+
+        self._logger.debug("Evicted %d clips from cache", len(victims))
+        return len(victims) == EVICT_BATCH or bool(budget)
+
+
+class Failures(object):
+    """
+    Remembers failed requests by cache path until their expiry time.
+
+    Failures are held in a dict for lookups, with a heap ordered by
+    expiry so that expired (or, past the size limit, soonest-to-expire)
+    entries can be dropped without walking every entry. Changes are
+    written through to the index database. Failures read back from the
+    database carry their original message in an exception of the same
+    type or, if it is not one of FAILURE_TYPES, the nearest type there
+    that it derives from (RuntimeError if none).
+    """
+
+    __slots__ = [
+        '_conn',     # SQLite3 connection to the index database
+        '_entries',  # dict of paths to (expiry, service ID, exception)
+        '_heap',     # heap of (expiry, path), may contain stale entries
+        '_index',    # path of the SQLite3 index database
+        '_limit',    # most failures to remember at once
+        '_logger',   # logger-like interface with debug(), info(), etc.
+    ]
+
+    def __init__(self, index, logger, limit=FAILURES_LIMIT):
+        """
+        Given the path to the index database, a logger, and optionally
+        a size limit, sets up the lookup. Nothing is read from disk
+        until the first call.
+        """
+
+        self._conn = None
+        self._entries = None
+        self._heap = None
+        self._index = index
+        self._limit = limit
+        self._logger = logger
+
+    def get(self, path):
+        """Returns the remembered exception for the path, if any."""
+
+        entries = self._load()
+        entry = entries.get(path)
+        if not entry:
+            return None
+        if entry[0] <= time():
+            self._expire()
+            return None
+        return entry[2]
+
+    def add(self, path, svc_id, exception, ttl):
+        """Remembers that the path failed for the given TTL in seconds."""
+
+        if ttl <= 0:
+            return
+
+        entries = self._load()
+        expires = time() + ttl
+        entries[path] = (expires, svc_id, exception)
+        heapq.heappush(self._heap, (expires, path))
+
+        kind = next((kind.__name__ for kind in type(exception).__mro__
+                     if FAILURE_TYPES.get(kind.__name__) is kind),
+                    'RuntimeError')
+
+        self._conn.execute('INSERT OR REPLACE INTO failures '
+                           '(path, service, expires, message, kind) '
+                           'VALUES (?,?,?,?,?)',
+                           (path, svc_id, expires, str(exception), kind))
+        self._expire()
+
+    def count(self):
+        """Returns the number of failures, after dropping expired ones."""
+
+        self._load()
+        self._expire()
+        return len(self._entries)
+
+    def clear(self):
+        """Forgets all failures."""
+
+        self._load()
+        self._entries.clear()
+        self._heap = []
+        self._conn.execute('DELETE FROM failures')
+        self._conn.commit()
+
+    def close(self):
+        """Closes the database; the lookup reloads itself on next use."""
+
+        if self._conn:
+            self._conn.close()
+        self._conn = None
+        self._entries = None
+        self._heap = None
+
+    def _load(self):
+        """Opens the database and reads unexpired failures, if needed."""
+
+        if self._entries is None:
+            conn = sqlite3.connect(self._index)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS failures ('
+                         'path TEXT PRIMARY KEY, '
+                         'service TEXT NOT NULL, '
+                         'expires REAL NOT NULL, '
+                         'message TEXT NOT NULL, '
+                         "kind TEXT NOT NULL DEFAULT 'RuntimeError')")
+            if 'kind' not in [column[1] for column in conn.execute(
+                    'PRAGMA table_info(failures)')]:
+                conn.execute('ALTER TABLE failures ADD COLUMN '
+                             "kind TEXT NOT NULL DEFAULT 'RuntimeError'")
+            conn.execute('DELETE FROM failures WHERE expires <= ?', (time(),))
+            conn.commit()
+
+            self._entries = {
+                path: (expires, svc_id,
+                       FAILURE_TYPES.get(kind, RuntimeError)(message))
+                for path, svc_id, expires, message, kind in conn.execute(
+                    'SELECT path, service, expires, message, kind '
+                    'FROM failures'
+                )
+            }
+            self._heap = [(entry[0], path)
+                          for path, entry in self._entries.items()]
+            heapq.heapify(self._heap)
+            self._conn = conn
+
+            self._logger.debug("Loaded %d remembered failures",
+                               len(self._entries))
+
+        return self._entries
+
+    def _expire(self):
+        """
+        Drops expired failures and, if over the size limit, the ones
+        closest to expiring, then commits any pending writes.
+        """
+
+        now = time()
+        entries = self._entries
+        heap = self._heap
+        dropped = []
+
+        while heap and (heap[0][0] <= now or len(entries) > self._limit):
+            expires, path = heapq.heappop(heap)
+            entry = entries.get(path)
+            if entry and entry[0] == expires:  # else superseded by add()
+                del entries[path]
+                dropped.append((path,))
+
+        if dropped:
+            self._conn.executemany('DELETE FROM failures WHERE path = ?',
+                                   dropped)
+        self._conn.commit()
@@ -24,17 +24,27 @@ Storage and management of add-on configuration
 #      AnkiWeb, e.g. by moving them into the collections database?
 #      See also <https://anki.tenderapp.com/discussions/add-ons/8512>.
 
+import json
 import sqlite3
+from threading import Lock, Timer
 
 __all__ = ['Config']
 
 
+WRITE_DELAY = 0.5  # seconds to gather further updates before writing out
+
+
 class Config(object):
     """
     Exposes a class whose instances have a dict-like interface for
     handling retrieving, caching, and serializing configuration stored
     in a given SQLite3 database table.
 
+    Updates take effect in memory right away, but are written out in
+    the background shortly afterward, so that a burst of them (e.g.
+    from a dialog being saved) costs only a single write. Call flush()
+    or close() to write them out immediately.
+
     As an alternative to the dict-like interface, attributes may be used
     for both reading and assigning, and kwargs may be used for update().
     """
@@ -71,8 +81,14 @@ class Config(object):
         '_db',           # path to database, table name, normalize callable
         '_cols',         # map of official lookup names to column definitions
         '_cache',        # in-memory lookup of preferences
+        '_conn',         # SQLite3 connection, kept open; guarded by _lock
+        '_dirty',        # map of lookup names updated but not yet written
         '_logger',       # where to send logging messages
+        '_lock',         # guards _conn, _dirty, _timer, and _cache writes
         '_events',       # map of lookup names to the callable(s) they trigger
+        '_revision',     # counter bumped by every update that changes a value
+        '_stored',       # map of keyed lookup names to the entries on disk
+        '_timer',        # pending background write, if one is scheduled
     ]
 
     def __init__(self, db, cols, logger, events=None):
@@ -89,11 +105,16 @@ class Config(object):
         The column definitions should be a list of tuples, each with:
 
             - 0th: SQLite3 column name
-            - 1st: SQLite3 column affinity
+            - 1st: SQLite3 column affinity, or 'keyed' for a dict kept
+                   in a table of its own (named after the main table and
+                   the column) with one row per entry, so that changing
+                   one entry only rewrites that entry
             - 2nd: default Python value to use when introducing a new
                    configuration item or a value cannot be parsed
             - 3rd: mapping function from SQLite3 type to Python type
+                   (for keyed columns, applied to each entry's value)
             - 4th: mapping function from Python type to SQLite3 type
+                   (for keyed columns, applied to each entry's value)
 
         The logger is a reference to any class instance or module with a
         logger-like interface (e.g. debug(), info(), warn() callables).
@@ -118,6 +139,12 @@ class Config(object):
                 self.bind(triggers, callback)
 
         self._cache = {}
+        self._conn = None
+        self._dirty = {}
+        self._lock = Lock()
+        self._revision = 0
+        self._stored = {}
+        self._timer = None
         self._load()
 
     def bind(self, triggers, callback):
@@ -151,11 +178,10 @@ class Config(object):
         the new column(s) using the default value(s).
         """
 
-        # open database connection
-        connection = sqlite3.connect(self._db.path, isolation_level=None)
-        connection.row_factory = sqlite3.Row
-        cursor = connection.cursor(self._LoggableCursor)
-        cursor.set_logger(self._logger)
+        plain_cols = [col for col in self._cols.values() if col[1] != 'keyed']
+        row = None
+
+        cursor = self._cursor()
 
         # check for existence of the configuration table
         if len(cursor.execute('SELECT name FROM sqlite_master '
@@ -171,7 +197,7 @@ class Config(object):
             # detect any new columns not present in database
             missing_cols = [
                 col
-                for col in self._cols.values()
+                for col in plain_cols
                 if col[0].lower() not in existing_cols
             ]
 
@@ -202,6 +228,9 @@ class Config(object):
             row = cursor.execute('SELECT * FROM %s' % self._db.table) \
                 .fetchone()
             for name, col in self._cols.items():
+                if col[1] == 'keyed':
+                    continue
+
                 # attempt to retrieve value; if it fails, use the default
                 try:
                     self._cache[name] = col[3](row[col[0]])
@@ -209,8 +238,6 @@ class Config(object):
                     self._cache[name] = col[2]
 
         else:
-            all_cols = list(self._cols.values())
-
             self._logger.info("Creating new configuration table")
 
             # create the table
@@ -218,7 +245,7 @@ class Config(object):
                 self._db.table,
                 ', '.join([
                     '%s %s' % (col[0], col[1])
-                    for col in all_cols
+                    for col in plain_cols
                 ]),
             ))
 
@@ -226,18 +253,22 @@ class Config(object):
             cursor.execute(
                 'INSERT INTO %s VALUES(%s)' % (
                     self._db.table,
-                    ', '.join(['?' for col in all_cols]),
+                    ', '.join(['?' for col in plain_cols]),
                 ),
-                tuple(col[4](col[2]) for col in all_cols),
+                tuple(col[4](col[2]) for col in plain_cols),
             )
 
             # populate in-memory store with the defaults we just inserted
             for name, col in self._cols.items():
-                self._cache[name] = col[2]
+                if col[1] != 'keyed':
+                    self._cache[name] = col[2]
+
+        # populate in-memory store of the keyed values from their tables
+        for name, col in self._cols.items():
+            if col[1] == 'keyed':
+                self._load_keyed(cursor, name, col, row)
 
-        # close database connection
         cursor.close()
-        connection.close()
 
         # since this is the initial load, notify all registered event handlers
         unique_callbacks = set()
@@ -246,6 +277,59 @@ class Config(object):
         for callback in unique_callbacks:
             callback(self)
 
+    def _load_keyed(self, cursor, name, col, row):
+        """
+        Reads the entries of the given keyed column from its table. If
+        the table does not exist yet, it is created and filled from the
+        JSON blob that older versions kept in the main table's row (if
+        there is one), or from the default value.
+        """
+
+        table = '%s_%s' % (self._db.table, col[0])
+
+        if not len(cursor.execute('SELECT name FROM sqlite_master '
+                                  'WHERE type=? AND name=?',
+                                  ('table', table)).fetchall()):
+            try:
+                entries = json.loads(row[col[0]])
+                if not isinstance(entries, dict):
+                    raise ValueError
+                self._logger.info("Moving %d %s into their own table",
+                                  len(entries), col[0])
+            except (IndexError, TypeError, ValueError):
+                entries = col[2]
+
+            # n.b. the old column is left alone, as SQLite cannot drop it
+            cursor.execute('BEGIN')
+            cursor.execute('CREATE TABLE %s (key TEXT PRIMARY KEY, '
+                           'value TEXT)' % table)
+            cursor.executemany('INSERT INTO %s VALUES(?, ?)' % table, [
+                (key, col[4](value))
+                for key, value in entries.items()
+            ])
+            cursor.execute('COMMIT')
+
+        entries = {}
+        for key, value in cursor.execute('SELECT key, value FROM %s' % table):
+            # attempt to retrieve value; if it fails, skip the entry
+            try:
+                entries[key] = col[3](value)
+            except ValueError:
+                self._logger.warning("Ignoring unreadable %s entry %s",
+                                     col[0], key)
+
+        self._cache[name] = entries
+        self._stored[name] = dict(entries)
+
+    def revision(self):
+        """
+        Returns a counter that goes up whenever update() changes any
+        value, e.g. so callers bound to some of the options can key
+        cached results to the state of the configuration they saw.
+        """
+
+        return self._revision
+
     def get(self, name, default=None):
         """
         Retrieve the current value for the given named configuration
@@ -305,38 +389,142 @@ class Config(object):
         if not updates:
             return
 
-        # update in-memory store of the values and notify callback handlers
+        # update in-memory store of the values and queue the names to be
+        # written out along with any others updated before the write happens
+        self._revision += 1
+        with self._lock:
+            for name, col, value in updates:
+                self._cache[name] = value
+                self._dirty[name] = col
+
+            if not self._timer:
+                self._timer = Timer(WRITE_DELAY, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        # notify callback handlers
         unique_callbacks = set()
         for name, col, value in updates:
-            self._cache[name] = value
             if name in self._events:
                 unique_callbacks.update(self._events[name])
         for callback in unique_callbacks:
             callback(self)
 
-        # open database connection
-        connection = sqlite3.connect(self._db.path, isolation_level=None)
-        cursor = connection.cursor(self._LoggableCursor)
-        cursor.set_logger(self._logger)
+    def flush(self):
+        """
+        Writes out the current values of any options that were updated
+        since the last write, all in a single statement.
+        """
 
-        # persist to SQLite3 database
-        cursor.execute(
-            'UPDATE %s SET %s' % (
-                self._db.table,
-                ', '.join([
-                    "%s=?" % col[0]
-                    for name, col, value in updates
-                ]),
-            ),
-            tuple(
-                col[4](value)
-                for name, col, value in updates
-            ),
-        )
-
-        # close database connection
-        cursor.close()
-        connection.close()
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+            if not self._dirty:
+                return
+
+            dirty, self._dirty = self._dirty, {}
+            plain = [(name, col) for name, col in dirty.items()
+                     if col[1] != 'keyed']
+            stored = {}
+
+            try:
+                values = {
+                    name: (dict(self._cache[name]) if col[1] == 'keyed'
+                           else self._cache[name])
+                    for name, col in dirty.items()
+                }
+
+                cursor = self._cursor()
+                cursor.execute('BEGIN')
+
+                if plain:
+                    cursor.execute(
+                        'UPDATE %s SET %s' % (
+                            self._db.table,
+                            ', '.join([
+                                "%s=?" % col[0]
+                                for name, col in plain
+                            ]),
+                        ),
+                        tuple(
+                            col[4](values[name])
+                            for name, col in plain
+                        ),
+                    )
+
+                for name, col in dirty.items():
+                    if col[1] == 'keyed':
+                        stored[name] = self._flush_keyed(cursor, name, col,
+                                                         values[name])
+
+                cursor.execute('COMMIT')
+                cursor.close()
+
+            except Exception as exception:  # catch all, pylint:disable=W0703
+                self._logger.error("Unable to save configuration: %s",
+                                   exception)
+                if self._conn and self._conn.in_transaction:
+                    self._conn.rollback()
+                dirty.update(self._dirty)
+                self._dirty = dirty  # try again on the next write
+
+            else:
+                self._stored.update(stored)
+
+    def _flush_keyed(self, cursor, name, col, entries):
+        """
+        Writes only the given entries of the keyed column that were
+        added, changed, or removed since it was last written, returning
+        the entries as they now stand on disk.
+        """
+
+        table = '%s_%s' % (self._db.table, col[0])
+        stored = self._stored[name]
+
+        cursor.executemany('INSERT OR REPLACE INTO %s VALUES(?, ?)' % table, [
+            (key, col[4](value))
+            for key, value in entries.items()
+            if key not in stored or stored[key] != value
+        ])
+        cursor.executemany('DELETE FROM %s WHERE key = ?' % table, [
+            (key,)
+            for key in stored
+            if key not in entries
+        ])
+
+        return entries
+
+    def close(self):
+        """
+        Writes out any pending updates and closes the database, e.g. on
+        profile unload. It is reopened if it is needed again afterward.
+        """
+
+        self.flush()
+
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    def _cursor(self):
+        """
+        Returns a logging cursor on the database connection, opening it
+        first if needed. Must be called with the lock held (or from the
+        initial load, before anything else can use the connection).
+        """
+
+        if not self._conn:
+            self._conn = sqlite3.connect(self._db.path, isolation_level=None,
+                                         check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute('PRAGMA journal_mode = WAL')
+
+        cursor = self._conn.cursor(self._LoggableCursor)
+        cursor.set_logger(self._logger)
+        return cursor
 
     def __setattr__(self, name, value):
         """
@@ -38,7 +38,7 @@ except:
 from ..paths import ICONS
 from .common import Label, Note, ICON
 
-__all__ = ['Dialog', 'ServiceDialog']
+__all__ = ['Dialog', 'Progress', 'ServiceDialog']
 
 # all methods might need 'self' in the future, pylint:disable=R0201
 
@@ -200,6 +200,95 @@ class Dialog(aqt.qt.QDialog):
         self._addon.logger.debug("Launching %s", url)
         aqt.qt.QDesktopServices.openUrl(aqt.qt.QUrl(url))
 
+class Progress(Dialog):
+    """
+    Provides a dialog that can be displayed while processing.
+    """
+
+    __slots__ = [
+        '_maximum',    # the value we are counting up to
+        '_on_cancel',  # callable to invoke if the user hits cancel
+    ]
+
+    def __init__(self, maximum, on_cancel, *args, **kwargs):
+        """
+        Configures our bar's maximum and registers a cancel callback.
+        """
+
+        self._maximum = maximum
+        self._on_cancel = on_cancel
+        super(Progress, self).__init__(*args, **kwargs)
+
+    # UI Construction ########################################################
+
+    def _ui(self):
+        """
+        Builds the interface with a status label and progress bar.
+        """
+
+        self.setMinimumWidth(500)
+
+        status = Note("Please wait...")
+        status.setAlignment(aqt.qt.Qt.AlignmentFlag.AlignCenter)
+        status.setObjectName('status')
+
+        progress_bar = aqt.qt.QProgressBar()
+        progress_bar.setMaximum(self._maximum)
+        progress_bar.setObjectName('bar')
+
+        detail = Note("")
+        detail.setAlignment(aqt.qt.Qt.AlignmentFlag.AlignCenter)
+        detail.setFixedHeight(100)
+        detail.setFont(self._FONT_INFO)
+        detail.setObjectName('detail')
+        detail.setScaledContents(True)
+
+        layout = super(Progress, self)._ui()
+        layout.addStretch()
+        layout.addWidget(status)
+        layout.addStretch()
+        layout.addWidget(progress_bar)
+        layout.addStretch()
+        layout.addWidget(detail)
+        layout.addStretch()
+        layout.addWidget(self._ui_buttons())
+
+        return layout
+
+    def _ui_buttons(self):
+        """
+        Overrides the default behavior to only have a cancel button.
+        """
+
+        buttons = aqt.qt.QDialogButtonBox()
+        buttons.setObjectName('buttons')
+        buttons.rejected.connect(self.reject)
+        buttons.setStandardButtons(aqt.qt.QDialogButtonBox.StandardButton.Cancel)
+        buttons.button(aqt.qt.QDialogButtonBox.StandardButton.Cancel).setAutoDefault(False)
+
+        return buttons
+
+    # Events #################################################################
+
+    def reject(self):
+        """
+        On cancel, disable the button and call our registered callback.
+        """
+
+        self.findChild(aqt.qt.QDialogButtonBox, 'buttons').setDisabled(True)
+        self._on_cancel()
+
+    def update(self, label, value, detail=None):
+        """
+        Update the status text and bar.
+        """
+
+        self.findChild(Note, 'status').setText(label)
+        self.findChild(aqt.qt.QProgressBar, 'bar').setValue(value)
+        if detail:
+            self.findChild(Note, 'detail').setText(detail)
+
+
 class ServiceDialog(Dialog):
     """
     Base used for all service-related dialog windows (e.g. single file
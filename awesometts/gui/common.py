@@ -30,7 +30,7 @@ import aqt.qt
 from ..paths import ICONS
 
 __all__ = ['ICON', 'Action', 'Button',
-           'Checkbox', 'Filter', 'HTML', 'Label', 'Note']
+           'Checkbox', 'Filter', 'HTML', 'Label', 'Note', 'update_notes']
 
 
 ICON_FILE = f'{ICONS}/speaker.png'
@@ -260,3 +260,19 @@ class Slate(aqt.qt.QHBoxLayout):  # pylint:disable=too-few-public-methods
 
         self.addWidget(list_view)
         self.addLayout(vert)
+
+
+def update_notes(col, notes):
+    """
+    Writes the given notes to the collection in one operation, without
+    an undo entry of its own so that the caller's checkpoint remains the
+    undo step. Falls back to flushing one at a time on older Anki.
+    """
+
+    try:
+        bulk = col.update_notes
+    except AttributeError:
+        for note in notes:
+            note.flush()
+    else:
+        bulk(notes, skip_undo_entry=True)
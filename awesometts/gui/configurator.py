@@ -19,8 +19,6 @@
 """Configuration dialog"""
 
 from locale import format as locale
-import os
-import os.path
 from sys import platform
 import pprint
 import aqt.utils
@@ -43,11 +41,12 @@ class Configurator(Dialog):
     """Provides a dialog for configuring the add-on."""
 
     _PROPERTY_KEYS = [
-        'cache_days', 'ellip_note_newlines',
+        'batch_concurrency', 'cache_days', 'cache_max_mb', 'ellip_note_newlines',
         'ellip_template_newlines', 'filenames', 'filenames_human', 'homescreen_show',
-        'lame_flags', 'shortcut_launch_browser_generator', 'shortcut_launch_browser_stripper',
+        'lame_flags', 'long_text_limit', 'long_text_sentences',
+        'shortcut_launch_browser_generator', 'shortcut_launch_browser_stripper',
         'shortcut_launch_configurator', 'shortcut_launch_editor_generator', 'shorcut_launch_templater',
-        'otf_only_revealed_cloze', 'otf_remove_hints', 'spec_note_strip',
+        'otf_only_revealed_cloze', 'otf_prefetch', 'otf_remove_hints', 'spec_note_strip',
         'spec_note_ellipsize', 'spec_template_ellipsize', 'spec_note_count',
         'spec_note_count_wrap', 'spec_template_count',
         'spec_template_count_wrap', 'spec_template_strip', 'strip_note_braces',
@@ -204,6 +203,18 @@ class Configurator(Dialog):
                                    'otf_remove_hints'))
             layout.addLayout(hor)
 
+            prefetch = aqt.qt.QSpinBox()
+            prefetch.setObjectName('otf_prefetch')
+            prefetch.setRange(0, 20)
+            prefetch.setSpecialValueText("no")
+            prefetch.setSuffix(" upcoming cards")
+
+            hor = aqt.qt.QHBoxLayout()
+            hor.addWidget(Label("While reviewing, prepare {{tts}} audio for "))
+            hor.addWidget(prefetch)
+            hor.addStretch()
+            layout.addLayout(hor)
+
         layout.addWidget(Checkbox(
             "Convert any newline(s) in input into an ellipsis",
             infix.join(['ellip', 'newlines'])
@@ -298,6 +309,7 @@ class Configurator(Dialog):
         vert = aqt.qt.QVBoxLayout()
         vert.addWidget(self._ui_tabs_mp3gen_filenames())
         vert.addWidget(self._ui_tabs_mp3gen_lame())
+        vert.addWidget(self._ui_tabs_mp3gen_long())
         vert.addWidget(self._ui_tabs_mp3gen_throttle())
         vert.addStretch()
 
@@ -360,6 +372,38 @@ class Configurator(Dialog):
         group.setLayout(vert)
         return group
 
+    def _ui_tabs_mp3gen_long(self):
+        """Returns the "Long Text" input group."""
+
+        limit = aqt.qt.QSpinBox()
+        limit.setObjectName('long_text_limit')
+        limit.setRange(0, 5000)
+        limit.setSingleStep(50)
+        limit.setSpecialValueText("never")
+        limit.setSuffix(" characters")
+
+        hor = aqt.qt.QHBoxLayout()
+        hor.addWidget(Label("Split text into pieces of at most "))
+        hor.addWidget(limit)
+        hor.addStretch()
+
+        rtr = self._addon.router
+        vert = aqt.qt.QVBoxLayout()
+        vert.addWidget(Note("Longer text is spoken in pieces that are "
+                            "recorded separately, at a sentence break if "
+                            "possible, and then joined into one MP3."))
+        vert.addLayout(hor)
+        vert.addWidget(Checkbox("Record each sentence separately, so that "
+                                "editing one does not redo the others",
+                                'long_text_sentences'))
+        vert.addWidget(Note("Only for services that return MP3. Does not "
+                            "affect %s." %
+                            ', '.join(rtr.by_trait(rtr.Trait.DICTIONARY))))
+
+        group = aqt.qt.QGroupBox("Long Text")
+        group.setLayout(vert)
+        return group
+
     def _ui_tabs_mp3gen_throttle(self):
         """Returns the "Download Throttling" input group."""
 
@@ -382,11 +426,23 @@ class Configurator(Dialog):
         hor.addWidget(sleep)
         hor.addStretch()
 
+        concurrency = aqt.qt.QSpinBox()
+        concurrency.setObjectName('batch_concurrency')
+        concurrency.setRange(0, 32)
+        concurrency.setSpecialValueText("automatic")
+        concurrency.setSuffix(" at once")
+
+        conc = aqt.qt.QHBoxLayout()
+        conc.addWidget(Label("Keep requests in flight "))
+        conc.addWidget(concurrency)
+        conc.addStretch()
+
         rtr = self._addon.router
         vert = aqt.qt.QVBoxLayout()
         vert.addWidget(Note("Tweak how often AwesomeTTS takes a break when "
                             "mass downloading files from online services."))
         vert.addLayout(hor)
+        vert.addLayout(conc)
         vert.addWidget(Note("Affects %s." %
                             ', '.join(rtr.by_trait(rtr.Trait.INTERNET))))
 
@@ -526,16 +582,35 @@ class Configurator(Dialog):
         days.setSuffix(" days")
 
         hor = aqt.qt.QHBoxLayout()
-        hor.addWidget(Label("Delete files older than"))
+        hor.addWidget(Label("Delete files unused for"))
         hor.addWidget(days)
-        hor.addWidget(Label("at exit (zero clears everything)"))
+        hor.addWidget(Label("(zero clears everything at exit)"))
         hor.addStretch()
 
+        budget = aqt.qt.QSpinBox()
+        budget.setObjectName('cache_max_mb')
+        budget.setRange(0, 999999)
+        budget.setSingleStep(128)
+        budget.setSpecialValueText("no limit")
+        budget.setSuffix(" MB")
+
+        lim = aqt.qt.QHBoxLayout()
+        lim.addWidget(Label("Keep the cache within"))
+        lim.addWidget(budget)
+        lim.addWidget(Label("by deleting least recently used files"))
+        lim.addStretch()
+
+        stats = Note()
+        stats.setObjectName('cache_stats')
+
         layout = aqt.qt.QVBoxLayout()
         layout.addWidget(Note("AwesomeTTS caches generated audio files and "
-                              "remembers failures during each session to "
+                              "remembers failures for a while (longer for "
+                              "words a dictionary service does not have) to "
                               "speed up repeated playback."))
         layout.addLayout(hor)
+        layout.addLayout(lim)
+        layout.addWidget(stats)
 
         abutton = aqt.qt.QPushButton("Delete Files")
         abutton.setObjectName('on_cache')
@@ -643,15 +718,23 @@ class Configurator(Dialog):
             else:
                 raise Exception(f'*** unsupported object type: {type(widget)}')
 
-        widget = self.findChild(aqt.qt.QPushButton, 'on_cache')
-        widget.atts_list = (
-            [filename for filename in os.listdir(self._addon.paths.cache)]
-            if os.path.isdir(self._addon.paths.cache) else []
+        stats = self._addon.cache.stats()
+        self.findChild(Note, 'cache_stats').setText(
+            "Currently holding %s files using %s MB, played back %s times%s" %
+            (locale("%d", stats['count'], grouping=True),
+             locale("%.1f", stats['bytes'] / 1048576.0, grouping=True),
+             locale("%d", stats['hits'], grouping=True),
+             " (still counting older files)." if stats['indexing'] else ".")
         )
-        if widget.atts_list:
+
+        widget = self.findChild(aqt.qt.QPushButton, 'on_cache')
+        if stats['indexing']:
+            widget.setEnabled(True)
+            widget.setText("Delete Files")
+        elif stats['count']:
             widget.setEnabled(True)
             widget.setText("Delete Files (%s)" %
-                           locale("%d", len(widget.atts_list), grouping=True))
+                           locale("%d", stats['count'], grouping=True))
         else:
             widget.setEnabled(False)
             widget.setText("Delete Files")
@@ -736,14 +819,8 @@ class Configurator(Dialog):
         """Attempts clear known files from cache."""
 
         button.setEnabled(False)
-        count_error = count_success = 0
-
-        for filename in button.atts_list:
-            try:
-                os.unlink(os.path.join(self._addon.paths.cache, filename))
-                count_success += 1
-            except:  # capture all exceptions, pylint:disable=W0702
-                count_error += 1
+        count_success, count_error = self._addon.cache.clear()
+        self.findChild(Note, 'cache_stats').setText("")
 
         if count_error:
             if count_success:
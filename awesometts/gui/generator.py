@@ -23,8 +23,8 @@ File generation dialogs
 from re import compile as re
 import aqt.qt
 
-from .base import Dialog, ServiceDialog
-from .common import Checkbox, Label, Note
+from .base import Progress, ServiceDialog
+from .common import Checkbox, Label, Note, update_notes
 
 __all__ = ['BrowserGenerator', 'EditorGenerator']
 
@@ -41,6 +41,8 @@ class BrowserGenerator(ServiceDialog):
 
     _RE_WHITESPACE = re(r'\s+')
 
+    _WRITE_BATCH = 250  # updated notes committed to the collection at once
+
     __slots__ = [
         '_browser',  # reference to the current Anki browser window
         '_notes',    # list of Note objects selected when window opened
@@ -255,7 +257,7 @@ class BrowserGenerator(ServiceDialog):
         self._process = {
             'all': now,
             'aborted': False,
-            'progress': _Progress(
+            'progress': Progress(
                 maximum=len(eligible_notes),
                 on_cancel=self._accept_abort,
                 title="Generating MP3s",
@@ -275,6 +277,9 @@ class BrowserGenerator(ServiceDialog):
                 'behavior': behavior,
             },
             'queue': eligible_notes,
+            'dirty': [],  # updated notes not yet written to the collection
+            'inflight': 0,  # notes handed to the router, callbacks pending
+            'concurrency': self._addon.router.get_concurrency(svc_id),
             'counts': {
                 'total': len(self._notes),
                 'elig': len(eligible_notes),
@@ -306,21 +311,35 @@ class BrowserGenerator(ServiceDialog):
 
     def _accept_next(self):
         """
-        Pop the next note off the queue, if not throttled, and process.
+        Pop notes off the queue, if not throttled, and process them until
+        the number of in-flight requests reaches the concurrency limit.
         """
 
+        proc = self._process
+        if not proc:  # a pending pump after we already wrapped up
+            return
+
         self._accept_update()
 
-        proc = self._process
         throttling = proc['throttling']
 
         if proc['aborted'] or not proc['queue']:
-            self._accept_done()
+            if not proc['inflight']:
+                self._accept_done()
+            return
+
+        if 'timer' in throttling:
             return
 
         if throttling['calls'] and \
            max(throttling['calls'].values()) >= throttling['threshold']:
-            # at least one service needs a break
+            # at least one service needs a break, so let whatever is still
+            # in flight land first; the last one back will call us again
+
+            if proc['inflight']:
+                return
+
+            self._accept_write()
 
             timer = aqt.qt.QTimer()
             throttling['timer'] = timer
@@ -331,7 +350,23 @@ class BrowserGenerator(ServiceDialog):
             timer.start()
             return
 
-        note = proc['queue'].pop(0)
+        # Only fill the slots that are open right now. Cache hits complete
+        # synchronously and schedule their own follow-up call, so bounding
+        # this loop keeps a long string of cached files from starving the UI.
+        for _ in range(proc['concurrency'] - proc['inflight']):
+            if not proc['queue']:
+                break
+            self._accept_note(proc['queue'].pop(0))
+
+    def _accept_note(self, note):
+        """
+        Send the given note's source field off to the router, keeping
+        track of it as in flight until its callbacks have run.
+        """
+
+        proc = self._process
+        throttling = proc['throttling']
+
         phrase = note[proc['fields']['source']]
         phrase = self._addon.strip.from_note(phrase)
         self._accept_update(phrase)
@@ -348,9 +383,12 @@ class BrowserGenerator(ServiceDialog):
             dest = proc['fields']['dest']
             note[dest] = self._accept_next_output(note[dest], filename)
             proc['counts']['okay'] += 1
-            note.flush()
 
-        def fail(exception, text="Not available by _accept_next.fail"):
+            proc['dirty'].append(note)
+            if len(proc['dirty']) >= self._WRITE_BATCH:
+                self._accept_write()
+
+        def fail(exception, text="Not available by _accept_note.fail"):
             """Count the failure and the unique message."""
 
             proc['counts']['fail'] += 1
@@ -373,20 +411,25 @@ class BrowserGenerator(ServiceDialog):
             except KeyError:
                 throttling['calls'][svc_id] = count
 
-        callbacks = dict(
-            done=done, okay=okay, fail=fail, miss=miss,
+        def then():
+            """Free up the slot and go looking for more work."""
+
+            proc['inflight'] -= 1
 
             # The call to _accept_next() is done via a single-shot QTimer for
             # a few reasons: keep the UI responsive, avoid a "maximum
             # recursion depth exceeded" exception if we hit a string of cached
             # files, and allow time to respond to a "cancel".
-            then=lambda: aqt.qt.QTimer.singleShot(0, self._accept_next),
-        )
+            aqt.qt.QTimer.singleShot(0, self._accept_next)
+
+        callbacks = dict(done=done, okay=okay, fail=fail, miss=miss, then=then)
 
         svc_id = proc['service']['id']
         want_human = (self._addon.config['filenames_human'] or '{{text}}' if
                       self._addon.config['filenames'] == 'human' else False)
 
+        proc['inflight'] += 1
+
         if svc_id.startswith('group:'):
             config = self._addon.config
             self._addon.router.group(text=phrase,
@@ -426,6 +469,18 @@ class BrowserGenerator(ServiceDialog):
             else:
                 return filename
 
+    def _accept_write(self):
+        """
+        Writes the notes updated since the last write to the collection
+        in one operation, leaving the "AwesomeTTS Batch Update"
+        checkpoint as the undo step for the whole run.
+        """
+
+        proc = self._process
+        notes, proc['dirty'] = proc['dirty'], []
+        if notes:
+            update_notes(self._browser.mw.col, notes)
+
     def _accept_throttled(self):
         """
         Called for every "timeout" of the timer during a throttling.
@@ -435,7 +490,8 @@ class BrowserGenerator(ServiceDialog):
 
         if proc['aborted']:
             proc['throttling']['timer'].stop()
-            self._accept_done()
+            del proc['throttling']['timer']
+            self._accept_next()
             return
 
         proc['throttling']['countdown'] -= 1
@@ -491,6 +547,7 @@ class BrowserGenerator(ServiceDialog):
         Display statistics and close out the dialog.
         """
 
+        self._accept_write()
         self._browser.model.reset()
 
         proc = self._process
@@ -837,91 +894,3 @@ class EditorGenerator(ServiceDialog):
                                want_human=want_human,
                                note=self._editor.note)
 
-
-class _Progress(Dialog):
-    """
-    Provides a dialog that can be displayed while processing.
-    """
-
-    __slots__ = [
-        '_maximum'    # the value we are counting up to
-        '_on_cancel'  # callable to invoke if the user hits cancel
-    ]
-
-    def __init__(self, maximum, on_cancel, *args, **kwargs):
-        """
-        Configures our bar's maximum and registers a cancel callback.
-        """
-
-        self._maximum = maximum
-        self._on_cancel = on_cancel
-        super(_Progress, self).__init__(*args, **kwargs)
-
-    # UI Construction ########################################################
-
-    def _ui(self):
-        """
-        Builds the interface with a status label and progress bar.
-        """
-
-        self.setMinimumWidth(500)
-
-        status = Note("Please wait...")
-        status.setAlignment(aqt.qt.Qt.AlignmentFlag.AlignCenter)
-        status.setObjectName('status')
-
-        progress_bar = aqt.qt.QProgressBar()
-        progress_bar.setMaximum(self._maximum)
-        progress_bar.setObjectName('bar')
-
-        detail = Note("")
-        detail.setAlignment(aqt.qt.Qt.AlignmentFlag.AlignCenter)
-        detail.setFixedHeight(100)
-        detail.setFont(self._FONT_INFO)
-        detail.setObjectName('detail')
-        detail.setScaledContents(True)
-
-        layout = super(_Progress, self)._ui()
-        layout.addStretch()
-        layout.addWidget(status)
-        layout.addStretch()
-        layout.addWidget(progress_bar)
-        layout.addStretch()
-        layout.addWidget(detail)
-        layout.addStretch()
-        layout.addWidget(self._ui_buttons())
-
-        return layout
-
-    def _ui_buttons(self):
-        """
-        Overrides the default behavior to only have a cancel button.
-        """
-
-        buttons = aqt.qt.QDialogButtonBox()
-        buttons.setObjectName('buttons')
-        buttons.rejected.connect(self.reject)
-        buttons.setStandardButtons(aqt.qt.QDialogButtonBox.StandardButton.Cancel)
-        buttons.button(aqt.qt.QDialogButtonBox.StandardButton.Cancel).setAutoDefault(False)
-
-        return buttons
-
-    # Events #################################################################
-
-    def reject(self):
-        """
-        On cancel, disable the button and call our registered callback.
-        """
-
-        self.findChild(aqt.qt.QDialogButtonBox, 'buttons').setDisabled(True)
-        self._on_cancel()
-
-    def update(self, label, value, detail=None):
-        """
-        Update the status text and bar.
-        """
-
-        self.findChild(Note, 'status').setText(label)
-        self.findChild(aqt.qt.QProgressBar, 'bar').setValue(value)
-        if detail:
-            self.findChild(Note, 'detail').setText(detail)
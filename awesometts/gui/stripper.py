@@ -20,10 +20,11 @@
 Sound tag-stripper dialog
 """
 
+from anki.utils import ids2str
 import aqt.qt
 
-from .base import Dialog
-from .common import Checkbox, Label, Note
+from .base import Dialog, Progress
+from .common import Checkbox, Label, Note, update_notes
 
 __all__ = ['BrowserStripper']
 
@@ -34,10 +35,13 @@ class BrowserStripper(Dialog):
     [sound] tags from a selection of notes in the card browser.
     """
 
+    _CHUNK = 500  # notes read, stripped, and written back at a time
+
     __slots__ = [
-        '_alerts',   # callable for reporting errors and summaries
-        '_browser',  # reference to the current Anki browser window
-        '_notes',    # list of Note objects selected when window opened
+        '_alerts',    # callable for reporting errors and summaries
+        '_browser',   # reference to the current Anki browser window
+        '_note_ids',  # list of note IDs selected when window opened
+        '_process',   # state during processing; see _accept_process()
     ]
 
     def __init__(self, browser, alerts, *args, **kwargs):
@@ -47,7 +51,8 @@ class BrowserStripper(Dialog):
 
         self._alerts = alerts
         self._browser = browser
-        self._notes = None  # set in show()
+        self._note_ids = None  # set in show()
+        self._process = None  # set in _accept_process()
 
         super(BrowserStripper, self).__init__(
             title="Remove Audio from Selected Notes",
@@ -115,21 +120,23 @@ class BrowserStripper(Dialog):
         the introduction message, both based on what is selected.
         """
 
-        self._notes = [
-            self._browser.mw.col.getNote(note_id)
-            for note_id in self._browser.selectedNotes()
-        ]
+        col = self._browser.mw.col
+        self._note_ids = self._browser.selectedNotes()
 
         self.findChild(Note, 'intro').setText(
             "From the %d note%s selected in the Browser, scan the following "
             "fields:" %
-            (len(self._notes), "s" if len(self._notes) != 1 else "")
+            (len(self._note_ids), "s" if len(self._note_ids) != 1 else "")
         )
 
+        # only the note types are needed here, not the notes themselves
         layout = aqt.qt.QVBoxLayout()
-        for field in sorted({field
-                             for note in self._notes
-                             for field in note.keys()}):
+        for field in sorted({field['name']
+                             for mid in col.db.list(
+                                 "select distinct mid from notes where id in "
+                                 + ids2str(self._note_ids)
+                             )
+                             for field in col.models.get(mid)['flds']}):
             checkbox = Checkbox(field)
             checkbox.atts_field_name = field
             layout.addWidget(checkbox)
@@ -173,7 +180,9 @@ class BrowserStripper(Dialog):
 
     def _accept_process(self, fields):
         """
-        Backend processing for accept(), called after a delay.
+        Backend processing for accept(), called after a delay. The notes
+        are stripped by _accept_work() in the background while a progress
+        dialog is shown; _accept_done() reports back afterward.
         """
 
         mode = next(
@@ -182,44 +191,139 @@ class BrowserStripper(Dialog):
             if radio.isChecked()
         )
 
+        strips = self._addon.strip.sounds
+        strip = (strips.ours if mode == 'ours'
+                 else strips.theirs if mode == 'theirs'
+                 else strips.univ)
+
         self._browser.mw.checkpoint("AwesomeTTS Sound Removal")
 
+        self._process = {
+            'aborted': False,
+            'mode': mode,
+            'progress': Progress(
+                maximum=len(self._note_ids),
+                on_cancel=self._accept_abort,
+                title="Removing Audio",
+                addon=self._addon,
+                parent=self,
+            ),
+        }
+        self._process['progress'].show()
+
+        self._browser.mw.taskman.run_in_background(
+            lambda: self._accept_work(fields, strip),
+            self._accept_done,
+        )
+
+    def _accept_abort(self):
+        """
+        Flags that the user has requested that processing stops.
+        """
+
+        self._process['aborted'] = True
+
+    def _accept_work(self, fields, strip):
+        """
+        Runs in a background thread, reading the raw field values of the
+        selected notes a chunk at a time, stripping the checked fields,
+        and writing back just the notes that changed in one update per
+        chunk. Returns the statistics for the summary.
+        """
+
+        mw = self._browser.mw
+        col = mw.col
+        note_ids = self._note_ids
+        logger = self._addon.logger
+
         stat = dict(
             notes=dict(proc=0, upd=0),
             fields=dict(proc=0, upd=0, skip=0),
         )
+        ords = {}  # note type IDs to the checked fields' names and ordinals
 
-        for note in self._notes:
-            note_updated = False
-            stat['notes']['proc'] += 1
+        for start in range(0, len(note_ids), self._CHUNK):
+            if self._process['aborted']:
+                break
 
-            for field in fields:
+            changed = []
+
+            for note_id, mid, flds in col.db.execute(
+                    "select id, mid, flds from notes where id in " +
+                    ids2str(note_ids[start:start + self._CHUNK])
+            ):
                 try:
-                    old_value = note[field]
-                    stat['fields']['proc'] += 1
+                    targets = ords[mid]
                 except KeyError:
-                    stat['fields']['skip'] += 1
-                    continue
-
-                strips = self._addon.strip.sounds
-                new_value = (strips.ours(old_value) if mode == 'ours'
-                             else strips.theirs(old_value) if mode == 'theirs'
-                             else strips.univ(old_value))
-
-                if old_value == new_value:
-                    self._addon.logger.debug("Note %d unchanged for %s\n%s",
-                                             note.id, field, old_value)
-                else:
-                    self._addon.logger.info("Note %d upd for %s\n%s\n%s",
-                                            note.id, field, old_value,
-                                            new_value)
-                    note[field] = new_value.strip()
-                    note_updated = True
-                    stat['fields']['upd'] += 1
-
-            if note_updated:
-                note.flush()
-                stat['notes']['upd'] += 1
+                    names = {field['name']: field['ord']
+                             for field in col.models.get(mid)['flds']}
+                    targets = ords[mid] = [(field, names[field])
+                                           for field in fields
+                                           if field in names]
+
+                stat['notes']['proc'] += 1
+                stat['fields']['proc'] += len(targets)
+                stat['fields']['skip'] += len(fields) - len(targets)
+
+                values = flds.split('\x1f')
+                updates = {}
+
+                for field, ordinal in targets:
+                    old_value = values[ordinal]
+                    new_value = strip(old_value)
+
+                    if old_value != new_value:
+                        logger.info("Note %d upd for %s\n%s\n%s",
+                                    note_id, field, old_value, new_value)
+                        updates[field] = new_value.strip()
+                        stat['fields']['upd'] += 1
+
+                if updates:
+                    note = col.getNote(note_id)
+                    for field, new_value in updates.items():
+                        note[field] = new_value
+                    changed.append(note)
+
+            if changed:
+                update_notes(col, changed)
+                stat['notes']['upd'] += len(changed)
+
+            processed = stat['notes']['proc']
+            mw.taskman.run_on_main(
+                lambda processed=processed: self._accept_update(processed)
+            )
+
+        return stat
+
+    def _accept_update(self, processed):
+        """
+        Update the progress bar and message.
+        """
+
+        if self._process:
+            self._process['progress'].update(
+                label="finished %d of %d" % (processed, len(self._note_ids)),
+                value=processed,
+            )
+
+    def _accept_done(self, future):
+        """
+        Display statistics and close out the dialog.
+        """
+
+        proc = self._process
+        proc['progress'].accept()
+        self._process = None
+        self._browser.model.reset()
+
+        try:
+            stat = future.result()
+        except Exception as exception:  # catch all, pylint:disable=W0703
+            self.setDisabled(False)
+            self._note_ids = None
+            self._alerts("Unable to remove audio: %s" % exception, self)
+            super(BrowserStripper, self).reject()
+            return
 
         messages = [
             "%d %s processed and %d %s updated." % (
@@ -252,10 +356,16 @@ class BrowserStripper(Dialog):
                             'Media" from the Anki "Tools" menu in the main '
                             "window.")
 
-        self._browser.model.reset()
-        self._addon.config['last_strip_mode'] = mode
+        if proc['aborted']:
+            messages.append("\n\n"
+                            "You aborted processing. If you want to rollback "
+                            "the changes to the notes that were already "
+                            "processed, use the Undo AwesomeTTS Sound Removal "
+                            "option from the Edit menu.")
+
+        self._addon.config['last_strip_mode'] = proc['mode']
         self.setDisabled(False)
-        self._notes = None
+        self._note_ids = None
 
         super(BrowserStripper, self).accept()
 
@@ -1,7 +1,8 @@
 import os
-import requests
 import json
 
+from .sessions import get_session
+
 class LanguageTools:
     def __init__(self, api_key, logger, client_version):
         self.logger = logger
@@ -15,6 +16,10 @@ class LanguageTools:
         self.api_key_verified = False
         self.use_vocabai_api = False
 
+    def session(self):
+        # shared keep-alive session, also used by the services
+        return get_session()
+
     def get_base_url(self):
         return self.base_url
 
@@ -31,7 +36,7 @@ class LanguageTools:
 
     def verify_api_key(self, api_key):
         # first , try to verify API key with vocab API
-        response = requests.get(self.vocab_api_base_url + '/account', headers={'Authorization': f'Api-Key {api_key}'})
+        response = self.session().get(self.vocab_api_base_url + '/account', headers={'Authorization': f'Api-Key {api_key}'})
         if response.status_code == 200:
             # API key is valid on vocab API
             self.api_key = api_key
@@ -42,7 +47,7 @@ class LanguageTools:
             }
 
         # now check with cloudlanguagetools API
-        response = requests.get(self.base_url + '/account', headers={
+        response = self.session().get(self.base_url + '/account', headers={
             'api_key': api_key
         })
         if response.status_code == 200:
@@ -77,15 +82,15 @@ class LanguageTools:
         self.ensure_key_verified()
 
         if self.use_vocabai_api:
-            response = requests.get(self.vocab_api_base_url + '/account', headers={'Authorization': f'Api-Key {self.api_key}'})
+            response = self.session().get(self.vocab_api_base_url + '/account', headers={'Authorization': f'Api-Key {self.api_key}'})
         else:
-            response = requests.get(self.base_url + '/account', headers={'api_key': self.api_key})
+            response = self.session().get(self.base_url + '/account', headers={'api_key': self.api_key})
         data = json.loads(response.content)
         return data
 
     def request_trial_key(self, email):
         self.logger.info(f'requesting trial key for email {email}')
-        response = requests.post(self.base_url + '/request_trial_key', json={'email': email})
+        response = self.session().post(self.base_url + '/request_trial_key', json={'email': email})
         data = json.loads(response.content)
         self.logger.info(f'retrieved {data}')
         if 'api_key' in data:
@@ -113,12 +118,12 @@ class LanguageTools:
                 'User-Agent': f'anki-awesometts/{self.client_version}',
             }
             full_url = self.vocab_api_base_url + '/audio'         
-            response = requests.post(full_url, json=data, headers=headers)
+            response = self.session().post(full_url, json=data, headers=headers)
         else:
             url_path = '/audio_v2'
             full_url = self.base_url + url_path
             self.logger.info(f'request url: {full_url}, data: {data}')
-            response = requests.post(full_url, json=data, headers={'api_key': self.get_api_key(), 'client': 'awesometts', 'client_version': self.client_version})
+            response = self.session().post(full_url, json=data, headers={'api_key': self.get_api_key(), 'client': 'awesometts', 'client_version': self.client_version})
 
         if response.status_code == 200:
             self.logger.info('success, receiving audio')
@@ -27,6 +27,7 @@ __all__ = [
     'ADDON',
     'ADDON_IS_LINKED',
     'CACHE',
+    'CACHE_INDEX',
     'CONFIG',
     'LOG',
     'TEMP',
@@ -53,6 +54,9 @@ USER_FILES = os.path.join(ROOT, 'user_files')
 CACHE = os.path.join(USER_FILES, 'cache')
 os.makedirs(CACHE, exist_ok=True)
 
+# index of the mp3 file cache (sizes, last access, hits)
+CACHE_INDEX = os.path.join(USER_FILES, 'cache.db')
+
 CONFIG = os.path.join(USER_FILES, 'config.db')
 
 LOG = os.path.join(ADDON, 'addon.log')
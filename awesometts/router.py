@@ -26,17 +26,25 @@ from random import shuffle
 import re
 from http.client import IncompleteRead
 from socket import error as SocketError
-from time import time
 from urllib.error import URLError
 
 import aqt.qt
 
-from .service import Trait as BaseTrait
+from .service import NotFound, Trait as BaseTrait
+from .text import segment, sentences
 
 __all__ = ['Router']
 
 
 FAILURE_CACHE_SECS = 3600  # ignore/dump failures from cache after one hour
+FAILURE_CACHE_SECS_DICTIONARY = 86400 * 30  # NotFound words stay missing
+
+CONCURRENCY_INTERNET = 4  # default requests in flight for online services
+CONCURRENCY_LOCAL = 1     # default requests in flight for local engines
+
+TEXT_LIMIT = 5000  # longest text sent whole if it cannot be split
+
+SHUTDOWN_WAIT = 5  # seconds to wait in all for workers to finish on shutdown
 
 RE_MUSTACHE = re.compile(r'\{?\{\{(.+?)\}\}\}?')
 RE_UNSAFE = re.compile(r'[^\w\s()-]', re.UNICODE)
@@ -47,6 +55,60 @@ WINDOWS_RESERVED = ['com1', 'com2', 'com3', 'com4', 'com5', 'com6', 'com7',
                     'lpt5', 'lpt6', 'lpt7', 'lpt8', 'lpt9', 'nul', 'prn']
 
 
+MP3_BITRATES = {  # kbps by bitrate index, for MPEG-1 and MPEG-2/2.5 layer III
+    3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000],
+             0: [11025, 12000, 8000]}  # Hz by version bits, rate index
+
+
+def _mp3_audio(data):
+    """
+    Returns the MPEG audio frames from the given MP3 file contents,
+    without any ID3 tags or the Xing/Info (LAME) or VBRI header frame,
+    so that the frames of several clips can be played back to back as
+    one file. Raises ValueError if the data is not a layer III stream.
+    """
+
+    start, end = 0, len(data)
+
+    while data[start:start + 3] == b'ID3' and end - start >= 10:
+        size = 0
+        for byte in data[start + 6:start + 10]:  # syncsafe, 7 bits each
+            size = size << 7 | byte & 0x7f
+        start += 10 + size + (10 if data[start + 5] & 0x10 else 0)
+
+    if data[end - 128:end - 125] == b'TAG':
+        end -= 128
+
+    header = data[start:start + 4]
+    if len(header) < 4 or header[0] != 0xff or header[1] & 0xe6 != 0xe2:
+        raise ValueError("Only MP3 clips can be joined as long text")
+
+    version = header[1] >> 3 & 3
+    try:
+        bitrate = MP3_BITRATES[3 if version == 3 else 2][header[2] >> 4]
+        rate = MP3_RATES[version][header[2] >> 2 & 3]
+    except (IndexError, KeyError):
+        raise ValueError("Audio has an unreadable MP3 frame header")
+
+    mono = header[3] >> 6 == 3
+    if version == 3:
+        info = start + (21 if mono else 36)
+    else:
+        info = start + (13 if mono else 21)
+
+    if data[info:info + 4] in (b'Xing', b'Info') or \
+            data[start + 36:start + 40] == b'VBRI':
+        if not bitrate:
+            raise ValueError("Audio has a free-format MP3 header frame")
+        start += ((144 if version == 3 else 72) * bitrate * 1000 // rate +
+                  (header[2] >> 1 & 1))
+
+    return data[start:end]
+
+
 def _prefixed(lines, prefix="!!! "):
     """Take incoming `lines` and prefix each line with `prefix`."""
 
@@ -68,21 +130,18 @@ class Router(object):
 
     Trait = BaseTrait
 
-    class BusyError(RuntimeError):
-        """Raised for requests for files that are already underway."""
-
     __slots__ = [
-        '_busy',       # list of file paths that are in-progress
-        '_cache_dir',  # path for writing cached media files
+        '_busy',       # dict of in-progress file paths to waiting callers
+        '_cache',      # instance of Cache for storing media files
         '_config',     # user configuration (dict-like)
-        '_failures',   # lookup of file paths that raised exceptions
+        '_failures',   # instance of Failures for paths that raised
         '_logger',     # logger-like interface with debug(), info(), etc.
         '_pool',       # instance of the _Pool class for managing threads
         '_services',   # bundle with dead services, aliases, avail, lookup
         '_temp_dir',   # path for writing human-readable filenames
     ]
 
-    def __init__(self, services, cache_dir, temp_dir, logger, config):
+    def __init__(self, services, cache, failures, temp_dir, logger, config):
         """
         The services should be a bundle with the following:
 
@@ -94,8 +153,9 @@ class Router(object):
             - kwargs (dict): to be passed to Service constructors
             - config (dict-like): user configuration lookup
 
-        The cache directory should be one where media files get stored
-        for a semi-permanent time.
+        The cache should be a Cache instance, whose directory is where
+        media files get stored for a semi-permanent time, and failures
+        a Failures instance for remembering requests that failed.
 
         The logger object should have an interface like the one used by
         the standard library logging module, with debug(), info(), and
@@ -118,12 +178,12 @@ class Router(object):
             for svc_id, svc_class in services.mappings
         }
 
-        self._busy = []
-        self._cache_dir = cache_dir
+        self._busy = {}
+        self._cache = cache
         self._config = config
-        self._failures = {}
+        self._failures = failures
         self._logger = logger
-        self._pool = _Pool(logger)
+        self._pool = _Pool(logger, lambda: config['worker_threads'])
         self._services = services
         self._temp_dir = temp_dir
 
@@ -227,23 +287,74 @@ class Router(object):
         svc_id, service = self._fetch_options_and_extras(svc_id)
         return service['extras']
 
+    def get_concurrency(self, svc_id):
+        """
+        Returns how many requests to the service may be in flight at once
+        during batch processing. The user's 'batch_concurrency' setting
+        is honored if set; otherwise, Internet-based services default to
+        several concurrent requests (as they are bound by network round
+        trips) and local services run one at a time.
+
+        Group IDs (i.e. 'group:xxx') are resolved to their presets, with
+        the most conservative service in the group deciding.
+        """
+
+        configured = self._config['batch_concurrency']
+        if configured > 0:
+            return configured
+
+        if svc_id.startswith('group:'):
+            try:
+                group = self._config['groups'][svc_id[6:]]
+                svc_ids = [self._config['presets'][preset]['service']
+                           for preset in group['presets']
+                           if preset in self._config['presets']]
+            except KeyError:
+                svc_ids = []
+        else:
+            svc_ids = [svc_id]
+
+        if svc_ids and all(self.has_trait(each, BaseTrait.INTERNET)
+                           for each in svc_ids):
+            return CONCURRENCY_INTERNET
+        return CONCURRENCY_LOCAL
+
     def get_failure_count(self):
         """
         Returns the number of cached failures, after dumping any expired
         entries from the cache.
         """
 
-        now = time()
-        for path, (when, _) in self._failures.items():
-            if now - when > FAILURE_CACHE_SECS:
-                del self._failures[path]
+        return self._failures.count()
+
+    def get_failure_ttl(self, svc_id, exception=None):
+        """
+        Returns how many seconds the given failure from the given
+        service should be remembered for, using the user's failure_ttls
+        configuration if it has an entry for the service.
+
+        A NotFound from a dictionary service means the word will stay
+        missing, so it defaults to a month. Any other failure (e.g. a
+        server, quota, or key error) may clear up soon, so it is kept
+        for an hour at most, even if the configured TTL is longer.
+        """
+
+        try:
+            configured = int(self._config['failure_ttls'][svc_id])
+        except (KeyError, TypeError, ValueError):
+            configured = None
+
+        if isinstance(exception, NotFound):
+            return (FAILURE_CACHE_SECS_DICTIONARY if configured is None
+                    else configured)
 
-        return len(self._failures)
+        return (FAILURE_CACHE_SECS if configured is None
+                else min(configured, FAILURE_CACHE_SECS))
 
     def forget_failures(self):
         """Delete the cache of remembered failures."""
 
-        self._failures = {}
+        self._failures.clear()
 
     def group(self, text, group, presets, callbacks,
               want_human=False, note=None):
@@ -294,16 +405,9 @@ class Router(object):
                 if 'then' in callbacks:
                     callbacks['then']()
 
-            def on_fail(exception, text):
-                """Go to next, unless playback already queued."""
-                if isinstance(exception, self.BusyError):
-                    if 'done' in callbacks:
-                        callbacks['done']()
-                    callbacks['fail'](exception, text)
-                    if 'then' in callbacks:
-                        callbacks['then']()
-                else:
-                    try_next()
+            def on_fail(exception, text):  # pylint:disable=W0613
+                """Go to next preset."""
+                try_next()
 
             internal_callbacks = dict(okay=on_okay, fail=on_fail)
             if 'miss' in callbacks:
@@ -387,17 +491,20 @@ class Router(object):
         try:
             self._logger.debug("Call for '%s' w/ %s", svc_id, options)
 
+            requested = options
             svc_id, service, options = self._validate_service(svc_id, options)
             if not text:
                 raise ValueError("No speakable text is present")
-            limit = 5000
-            if len(text) > limit:
+            segments = ([text]
+                        if BaseTrait.DICTIONARY in service['class'].TRAITS
+                        else self._segments(text))
+            if len(segments) == 1 and len(text) > TEXT_LIMIT:
                 raise ValueError("Text to speak is too long")
             text = service['instance'].modify(text)
             if not text:
                 raise ValueError("Text not usable by " + service['class'].NAME)
             path = self._validate_path(svc_id, text, options)
-            cache_hit = os.path.exists(path)
+            cache_hit = path not in self._busy and self._cache.exists(path)
 
             self._logger.debug(
                 "Parsed call to '%s' w/ %s and \"%s\" at %s (cache %s)",
@@ -495,67 +602,83 @@ class Router(object):
 
             return new_path
 
+        failure = (None if cache_hit or path in self._busy
+                   else self._failures.get(path))
+
         if cache_hit:
+            self._cache.hit(path)
             if 'done' in callbacks:
                 callbacks['done']()
             callbacks['okay'](human(path))
             if 'then' in callbacks:
                 callbacks['then']()
 
-        elif (path in self._failures and
-              time() - self._failures[path][0] < FAILURE_CACHE_SECS):
+        elif path in self._busy:
+            # the same clip is already being generated, so just wait on it
+            self._logger.debug("Joining in-progress call for %s", path)
+            self._busy[path].append((callbacks, human))
+
+        elif failure:
             if 'done' in callbacks:
                 callbacks['done']()
-            callbacks['fail'](self._failures[path][1], text)
+            callbacks['fail'](failure, text)
             if 'then' in callbacks:
                 callbacks['then']()
 
+        elif len(segments) > 1:
+            self._busy[path] = [(callbacks, human)]
+            self._call_long(svc_id, text, segments, requested, path,
+                            async_variable)
+
         else:
             def on_error(exception):
                 """
                 For Internet-based services, cache errors. Certain
                 exceptions are not cached, as they are usually network
-                or connectivity errors.
-
-                Afterward, pass exception to the fail handler.
+                or connectivity errors. A NotFound is always cached,
+                even though it is also an IOError.
                 """
 
-                if BaseTrait.INTERNET in service['class'].TRAITS and \
+                if isinstance(exception, NotFound) or \
+                   BaseTrait.INTERNET in service['class'].TRAITS and \
                    not isinstance(exception, IncompleteRead) and \
                    not isinstance(exception, SocketError) and \
                    not isinstance(exception, URLError):
-                    self._failures[path] = time(), exception
-                callbacks['fail'](exception, text)
+                    self._failures.add(path, svc_id, exception,
+                                       self.get_failure_ttl(svc_id,
+                                                            exception))
 
-            service['instance'].net_reset()
-            self._busy.append(path)
+            self._busy[path] = [(callbacks, human)]
+            counted = dict(netops=0)  # from the thread that ran the service
 
-            def completion_callback(exception, text="Not available by Router.__call__.completion_callback"):
-                """Intermediate callback handler for all service calls."""
-
-                self._busy.remove(path)
-
-                if 'done' in callbacks:
-                    callbacks['done']()
+            def completion_callback(exception):
+                """
+                Intermediate callback handler for all service calls,
+                passing the result on to this caller and to any other
+                callers that asked for the same clip in the meantime.
+                """
 
-                if 'miss' in callbacks:
-                    callbacks['miss'](svc_id, service['instance'].net_count())
+                if not exception and not os.path.exists(path):
+                    exception = RuntimeError(
+                        "The %s service did not successfully write out an "
+                        "MP3." % service['name']
+                    )
 
                 if exception:
                     on_error(exception)
-                elif os.path.exists(path):
-                    callbacks['okay'](human(path))
                 else:
-                    on_error(RuntimeError(
-                        "The %s service did not successfully write out an "
-                        "MP3." % service['name']
-                    ))
+                    self._cache.add(path)
 
-                if 'then' in callbacks:
-                    callbacks['then']()
+                self._release(path, svc_id, text, exception,
+                              counted['netops'])
 
             def task():
-                service['instance'].run(text, options, path)
+                instance = service['instance']
+                instance.net_reset()
+                try:
+                    instance.run(text, options, path)
+                finally:
+                    counted['netops'] = instance.net_count()
 
             if async_variable:
                 def do_spawn():
@@ -563,14 +686,18 @@ class Router(object):
                     self._pool.spawn(
                         task=task,
                         callback=completion_callback,
+                        key=svc_id,
+                        limit=self.get_concurrency(svc_id),
                     )
             else:
-                callback_exception = None
-                try:
-                    task()
-                except Exception as exception:
-                    callback_exception = exception
-                completion_callback(callback_exception)
+                def do_spawn():
+                    """Call if ready to run the service in this thread."""
+                    callback_exception = None
+                    try:
+                        task()
+                    except Exception as exception:  # pylint:disable=W0703
+                        callback_exception = exception
+                    completion_callback(callback_exception)
 
             if hasattr(service['instance'], 'prerun'):
                 def prerun_ok(result):
@@ -594,6 +721,120 @@ class Router(object):
             else:
                 do_spawn()
 
+    def shutdown(self):
+        """Stops the background worker threads, e.g. on session exit."""
+
+        self._pool.shutdown()
+
+    def _call_long(self, svc_id, text, segments, options, path,
+                   async_variable):
+        """
+        Synthesizes text by running each of the given segments of it
+        back through the router, so that every segment is cached,
+        coalesced, and throttled like any other call and several can be
+        in flight at once. When the last one finishes, the clips are
+        joined together at the given path and the callers waiting on it
+        are told.
+        """
+
+        paths = [None] * len(segments)
+        state = dict(count=None, exception=None, remaining=len(segments))
+
+        self._logger.debug("Splitting call to '%s' into %d segments",
+                           svc_id, len(segments))
+
+        def finish():
+            """Joins the segment clips and passes on the result."""
+
+            if not state['exception']:
+                try:
+                    with open(path, 'wb') as output:
+                        for segment_path in paths:
+                            with open(segment_path, 'rb') as segment_input:
+                                output.write(_mp3_audio(segment_input.read()))
+                except (IOError, OSError, ValueError) as exception:
+                    state['exception'] = exception
+                    if os.path.exists(path):
+                        os.unlink(path)
+                else:
+                    self._cache.add(path)
+
+            self._release(path, svc_id, text, state['exception'],
+                          state['count'])
+
+        def callbacks(index):
+            """Returns the callbacks for the segment at index."""
+
+            def okay(segment_path):
+                """Remembers where the segment's clip is."""
+                paths[index] = segment_path
+
+            def fail(exception, text):  # pylint:disable=W0613
+                """Keeps the first failure to report for the text."""
+                if not state['exception']:
+                    state['exception'] = exception
+
+            def miss(svc_id, count):  # pylint:disable=W0613
+                """Tallies downloads across all of the segments."""
+                state['count'] = (state['count'] or 0) + count
+
+            def then():
+                """Joins the clips once every segment has finished."""
+                state['remaining'] -= 1
+                if not state['remaining']:
+                    finish()
+
+            return dict(okay=okay, fail=fail, miss=miss, then=then)
+
+        for index, each in enumerate(segments):
+            self(svc_id=svc_id, text=each, options=dict(options),
+                 callbacks=callbacks(index), async_variable=async_variable)
+
+    def _segments(self, text):
+        """
+        Returns the pieces that the text should be synthesized in. If
+        the user caches by sentence, that is one piece per sentence, so
+        that editing one sentence of a paragraph only needs that one to
+        be synthesized again. Otherwise, text over the long text limit
+        is split into as few pieces as will fit. A single piece means
+        that the text is synthesized whole.
+        """
+
+        limit = self._config['long_text_limit']
+
+        if self._config['long_text_sentences']:
+            return sentences(text, limit)
+
+        if limit > 0 and len(text) > limit:
+            return [each for each in segment(text, limit) if each.strip()]
+
+        return [text]
+
+    def _release(self, path, svc_id, text, exception, count):
+        """
+        Passes the result for the given path on to every caller waiting
+        on it. Only the first caller's miss callback is executed, with
+        the download count, as the others did not cause a download; it
+        is skipped altogether if count is None, as nothing was fetched.
+        """
+
+        waiters = self._busy.pop(path)
+
+        for number, (waiter, waiter_human) in enumerate(waiters):
+            if 'done' in waiter:
+                waiter['done']()
+
+            if number == 0 and count is not None and 'miss' in waiter:
+                waiter['miss'](svc_id, count)
+
+            if exception:
+                waiter['fail'](exception, text)
+            else:
+                waiter['okay'](waiter_human(path))
+
+            if 'then' in waiter:
+                waiter['then']()
+
     def _call_assert_callbacks(self, callbacks):
         """Checks the callbacks argument for validity."""
 
@@ -704,18 +945,10 @@ class Router(object):
     def _validate_path(self, svc_id, text, options):
         """
         Given the service ID, its associated options, and the desired
-        text, generate a cache path. If the file is already being
-        processed, raise a BusyError.
+        text, generate a cache path.
         """
 
-        path = self._path_cache(svc_id, text, options)
-        if path in self._busy:
-            raise self.BusyError(
-                "The '%s' service is already busy processing %s." %
-                (svc_id, path)
-            )
-
-        return path
+        return self._path_cache(svc_id, text, options)
 
     def _fetch_options_and_extras(self, svc_id, force_options_reload=False):
         """
@@ -881,8 +1114,7 @@ class Router(object):
         ).hexdigest().lower()
 
         assert len(hex_digest) == 40, "unexpected output from hash library"
-        return os.path.join(
-            self._cache_dir,
+        return self._cache.path(
             '.'.join([
                 '-'.join([
                     svc_id, hex_digest[:8], hex_digest[8:16],
@@ -890,60 +1122,150 @@ class Router(object):
                 ]),
                 'mp3',
             ]),
+            hex_digest,
         )
 
 
 class _Pool(aqt.qt.QWidget):
     """
-    Managers a pool of worker threads to keep the UI responsive.
+    Manages a fixed-size pool of persistent worker threads to keep the
+    UI responsive.
+
+    Tasks are queued here in the main thread and handed to idle workers
+    as long as neither the pool nor the task's service is at capacity,
+    so no thread is created or destroyed on the hot path.
     """
 
     __slots__ = [
-        '_current_id',  # the last/current worker ID in-use
+        '_active',      # dict of service keys to count of tasks running
+        '_current_id',  # the last/current task ID in-use
         '_logger',      # for writing messages about threads
-        '_threads',     # dict of IDs mapping workers and callbacks in Router
+        '_pending',     # deque of tasks waiting for a free slot
+        '_queue',       # thread-safe queue of tasks handed to the workers
+        '_retired',     # stopped workers that were still busy at shutdown
+        '_running',     # dict of task IDs mapping callbacks and keys
+        '_size',        # callable returning the maximum number of workers
+        '_workers',     # list of persistent _Worker threads
     ]
 
-    def __init__(self, logger, *args, **kwargs):
+    def __init__(self, logger, size, *args, **kwargs):
         """
-        Initialize my internal state (next ID and lookup pools for the
-        callbacks and workers).
+        Initialize my internal state (next ID, queues, and lookups for
+        the callbacks and workers). The size is a callable so that a
+        change in configuration takes effect without a restart.
         """
 
         super(_Pool, self).__init__(*args, **kwargs)
 
+        from collections import deque
+        from queue import Queue
+
+        self._active = {}
         self._current_id = 0
         self._logger = logger
-        self._threads = {}
-
-    def spawn(self, task, callback):
+        self._pending = deque()
+        self._queue = Queue()
+        self._retired = []
+        self._running = {}
+        self._size = size
+        self._workers = []
+
+    def spawn(self, task, callback, key=None, limit=None):
         """
-        Create a worker thread for the given task. When the thread
-        completes, the callback will be called.
+        Queue the given task for a worker thread. When the task
+        completes, the callback will be called in the main thread.
+
+        If a key (e.g. a service ID) and limit are passed, no more than
+        limit tasks sharing that key will be running at any given time.
         """
 
         self._current_id += 1
-        thread = self._threads[self._current_id] = {
-            # keeping a reference to worker prevents garbage collection
-            'callback': callback,
-            'done': False,
-            'worker': _Worker(self._current_id, task),
-        }
-
-        thread['worker'].tts_thread_done.connect(self._on_worker_signal)
-        thread['worker'].tts_thread_raised.connect(self._on_worker_signal)
-        thread['worker'].finished.connect(self._on_worker_finished)
-        thread['worker'].start()
+        self._pending.append((self._current_id, task, callback, key, limit))
 
         self._logger.debug(
-            "Spawned thread [%d]; pool=%s",
-            self._current_id, self._threads,
+            "Queued task [%d]; %d pending, %d running",
+            self._current_id, len(self._pending), len(self._running),
         )
 
+        self._dispatch()
+
+    def shutdown(self):
+        """
+        Stop all of the worker threads once they finish whatever they
+        are currently running, waiting up to SHUTDOWN_WAIT seconds in
+        all. Workers still busy after that are left to stop by themselves
+        on their own queue. Tasks still pending are kept, and new workers
+        will be started if another task is spawned later.
+        """
+
+        if not self._workers:
+            return
+
+        from queue import Queue
+        from time import time
+
+        for _ in self._workers:
+            self._queue.put(None)
+        self._queue = Queue()
+
+        deadline = time() + SHUTDOWN_WAIT
+        for worker in self._workers:
+            worker.wait(max(int((deadline - time()) * 1000), 0))
+
+        busy = [worker for worker in self._workers if worker.isRunning()]
+        self._retired = [worker for worker in self._retired
+                         if worker.isRunning()] + busy
+
+        self._logger.debug("Stopped %d worker thread%s, %d still busy",
+                           len(self._workers),
+                           "s" if len(self._workers) != 1 else "",
+                           len(busy))
+        self._workers = []
+
+    def _dispatch(self):
+        """
+        Hand pending tasks to the workers while there is room in the
+        pool, skipping over tasks whose key is already at its limit.
+        """
+
+        size = max(self._size(), 1)
+        deferred = []
+
+        while self._pending and len(self._running) < size:
+            thread_id, task, callback, key, limit = self._pending.popleft()
+
+            if key is not None and limit and \
+               self._active.get(key, 0) >= limit:
+                deferred.append((thread_id, task, callback, key, limit))
+                continue
+
+            if len(self._workers) <= len(self._running):
+                self._grow()
+
+            self._running[thread_id] = {'callback': callback, 'key': key}
+            if key is not None:
+                self._active[key] = self._active.get(key, 0) + 1
+            self._queue.put((thread_id, task))
+
+        if deferred:
+            self._pending.extendleft(reversed(deferred))
+
+    def _grow(self):
+        """Start up one more persistent worker thread."""
+
+        worker = _Worker(self._queue)
+        worker.tts_thread_done.connect(self._on_worker_signal)
+        worker.tts_thread_raised.connect(self._on_worker_signal)
+        worker.start()
+        self._workers.append(worker)
+
+        self._logger.debug("Started worker thread #%d", len(self._workers))
+
     def _on_worker_signal(self, thread_id, exception=None, stack_trace=None):
         """
-        When the worker signals it's done with its task, execute the
-        callback that was registered for it, passing on any exception.
+        When the worker signals it's done with a task, execute the
+        callback that was registered for it, passing on any exception,
+        and then start any tasks that were waiting on a free slot.
         """
 
         if exception:
@@ -952,7 +1274,7 @@ class _Pool(aqt.qt.QWidget):
                 message = "No additional details available"
 
             self._logger.debug(
-                "Exception from thread [%d] (%s); executing callback\n%s",
+                "Exception from task [%d] (%s); executing callback\n%s",
 
                 thread_id, message,
 
@@ -963,72 +1285,61 @@ class _Pool(aqt.qt.QWidget):
 
         else:
             self._logger.debug(
-                "Completion from thread [%d]; executing callback",
+                "Completion from task [%d]; executing callback",
                 thread_id,
             )
 
-        self._threads[thread_id]['callback'](exception)
-        self._threads[thread_id]['done'] = True
+        running = self._running.pop(thread_id)
+        if running['key'] is not None:
+            self._active[running['key']] -= 1
+            if not self._active[running['key']]:
+                del self._active[running['key']]
 
-    def _on_worker_finished(self):
-        """
-        When the worker is finished, which happens sometime briefly
-        after it's done with its task, delete it from the thread pool if
-        its callback has already executed.
-        """
-
-        thread_ids = [
-            thread_id
-            for thread_id, thread in self._threads.items()
-            if thread['done'] and thread['worker'].isFinished()
-        ]
-
-        if not thread_ids:
-            return
-
-        for thread_id in thread_ids:
-            del self._threads[thread_id]
-
-        self._logger.debug(
-            "Reaped thread%s %s; pool=%s",
-            "s" if len(thread_ids) != 1 else "", thread_ids, self._threads,
-        )
+        try:
+            running['callback'](exception)
+        finally:
+            self._dispatch()
 
 
 class _Worker(aqt.qt.QThread):
     """
-    Generic worker for running processes in the background.
+    Generic persistent worker for running tasks in the background.
     """
 
     tts_thread_done = aqt.qt.pyqtSignal(int, name='awesomeTtsThreadDone')
     tts_thread_raised = aqt.qt.pyqtSignal(int, Exception, str, name='awesomeTtsThreadRaised')
 
     __slots__ = [
-        '_thread_id',  # my thread ID; used to communicate back to main thread
-        '_task',       # the task I will need to call when run
+        '_queue',  # shared queue of (task ID, task) tuples; None to stop
     ]
 
-    def __init__(self, thread_id, task):
+    def __init__(self, queue):
         """
-        Save my worker ID and task.
+        Save a reference to the shared task queue.
         """
 
         super(_Worker, self).__init__()
 
-        self._id = thread_id
-        self._task = task
+        self._queue = queue
 
     def run(self):
         """
-        Run my assigned task. If an exception is raised, pass it back to
-        the main thread via the callback.
+        Run tasks off the queue until told to stop. If a task raises an
+        exception, pass it back to the main thread via the signal.
         """
 
-        try:
-            self._task()
-        except Exception as exception:  # catch all, pylint:disable=W0703
-            from traceback import format_exc
-            self.tts_thread_raised.emit(self._id, exception, format_exc())
-            return
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            thread_id, task = item
+
+            try:
+                task()
+            except Exception as exception:  # catch all, pylint:disable=W0703
+                from traceback import format_exc
+                self.tts_thread_raised.emit(thread_id, exception, format_exc())
+                continue
 
-        self.tts_thread_done.emit(self._id)
+            self.tts_thread_done.emit(thread_id)
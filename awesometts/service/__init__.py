@@ -20,7 +20,7 @@
 Service classes for AwesomeTTS
 """
 
-from .common import Trait
+from .common import NotFound, Trait
 
 from .amazon import Amazon
 from .azure import Azure
@@ -56,6 +56,7 @@ from .watson import Watson
 
 __all__ = [
     # common
+    'NotFound',
     'Trait',
 
     # services
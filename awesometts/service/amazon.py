@@ -5,11 +5,10 @@ Service implementation for the Amazon/AWS Polly service, routed through the Lang
 
 import time
 import datetime
-import requests
 from xml.etree import ElementTree
 from .base import Service
 from .languages import StandardVoice
-from .voicelist import VOICE_LIST
+from . import voicelist
 from typing import List
 
 __all__ = ['Amazon']
@@ -27,6 +26,8 @@ class Amazon(Service):
 
     TRAITS = []
 
+    _voices = voicelist.VoiceIndex('Amazon', AmazonVoice)
+
     def desc(self):
         """Returns name with a voice count."""
 
@@ -37,18 +38,11 @@ class Amazon(Service):
         return []
 
     def get_voices(self) -> List[StandardVoice]:
-        voices = [x for x in VOICE_LIST if x['service'] == 'Amazon']
-        voices = sorted(voices, key=lambda x: x['voice_description'])
-        voice_list = []
-        for voice_data in voices:
-            voice_list.append(AmazonVoice(voice_data))
-        return voice_list
+        return self._voices.voices()
 
 
     def get_voice_for_key(self, key) -> AmazonVoice:
-        voice = [voice for voice in self.get_voices() if voice.get_key() == key]
-        assert(len(voice) == 1)
-        return voice[0]
+        return self._voices.get(key)
 
 
     def get_voice_list(self):
@@ -23,13 +23,12 @@ https://azure.microsoft.com/en-us/services/cognitive-services/text-to-speech/
 
 import time
 import datetime
-import requests
 from xml.etree import ElementTree
 from .base import Service
 from .languages import Gender
 from .languages import Language
 from .languages import Voice
-from .voicelist import VOICE_LIST
+from . import voicelist
 from typing import List
 
 __all__ = ['Azure']
@@ -96,6 +95,8 @@ class Azure(Service):
     # to rate-limit it or trigger error caching behavior
     TRAITS = []
 
+    _voices = voicelist.VoiceIndex('Azure', AzureVoice)
+
     def desc(self):
         """Returns name with a voice count."""
 
@@ -109,18 +110,10 @@ class Azure(Service):
         return [dict(key='key', label="API Key", required=True)]
 
     def get_voices(self) -> List[AzureVoice]:
-        # generated using tools/service_azure_voicelist.py
-        azure_voices = [x for x in VOICE_LIST if x['service'] == 'Azure']
-        azure_voices = sorted(azure_voices, key=lambda x: x['voice_description'])
-        voice_list = []
-        for voice_data in azure_voices:
-            voice_list.append(AzureVoice(voice_data))
-        return voice_list
+        return self._voices.voices()
 
     def get_voice_for_key(self, key) -> AzureVoice:
-        voice = [voice for voice in self.get_voices() if voice.get_key() == key]
-        assert(len(voice) == 1)
-        return voice[0]
+        return self._voices.get(key)
 
 
     def get_voice_list(self):
@@ -167,7 +160,7 @@ class Azure(Service):
         headers = {
             'Ocp-Apim-Subscription-Key': subscription_key
         }
-        response = requests.post(fetch_token_url, headers=headers)
+        response = self.net_session().post(fetch_token_url, headers=headers)
         self.access_token = str(response.text)
         self.access_token_timestamp = datetime.datetime.now()
         self._logger.debug(f'requested access_token')
@@ -231,7 +224,7 @@ class Azure(Service):
             
             body = ssml_str.encode(encoding='utf-8')
 
-            response = requests.post(constructed_url, headers=headers, data=body)
+            response = self.net_session().post(constructed_url, headers=headers, data=body)
             if response.status_code == 200:
                 with open(path, 'wb') as audio:
                     audio.write(response.content)
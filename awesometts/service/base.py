@@ -28,17 +28,47 @@ import os
 import shutil
 import sys
 import subprocess
-import requests
+import threading
 import aqt.sound
 
+from ..sessions import get_session
+from ..text import SPLIT_MINIMUM, SPLIT_PRIORITY, segment
+
 __all__ = ['Service']
 
 
 DEFAULT_UA = 'Mozilla/5.0'
 DEFAULT_TIMEOUT = 15
 
+NET_CHUNK_SIZE = 2**14  # bytes read at a time when streaming a download
+NET_FANOUT = 4          # most targets of one call fetched at the same time
+NET_THREADS = 32        # fetch threads shared by all calls (workers x fan-out)
+
 PADDING = b'\0' * 2**11
 
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _get_executor():
+    """
+    Returns the executor shared by every multi-target fetch, creating it
+    on first use. Its threads are started as needed and then reused, so
+    a call split into several targets does not pay to spin up and tear
+    down a thread pool of its own.
+    """
+
+    global _EXECUTOR  # pylint:disable=global-statement
+
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _EXECUTOR = ThreadPoolExecutor(max_workers=NET_THREADS,
+                                               thread_name_prefix='atts-net')
+
+    return _EXECUTOR
+
 
 class Service(object, metaclass=abc.ABCMeta):
     """
@@ -65,7 +95,7 @@ class Service(object, metaclass=abc.ABCMeta):
         """Raises when a download is too small."""
 
     __slots__ = [
-        '_netops',      # number of network ops required by the last run
+        '_netlocal',    # per-thread storage backing _netops
         '_lame_flags',  # callable to get flag string for LAME transcoder
         '_logger',      # logging interface with debug(), info(), etc.
         'normalize',    # callable for standardizing string values
@@ -110,12 +140,7 @@ class Service(object, metaclass=abc.ABCMeta):
         '\u2019': "'", '\u201c': '"', '\u201d': '"', '\u212b': 'A',
     }
 
-    SPLIT_PRIORITY = [
-        ['.', '?', '!', '\u3002'],
-        [',', ';', ':', '\u3001'],
-        [' ', '\u3000'],
-        ['-', '\u2027', '\u30fb'],
-    ]
+    SPLIT_PRIORITY = SPLIT_PRIORITY
 
     SPLIT_CHARACTERS = ''.join(
         symbol
@@ -123,7 +148,7 @@ class Service(object, metaclass=abc.ABCMeta):
         for symbol in symbols
     )
 
-    SPLIT_MINIMUM = 5
+    SPLIT_MINIMUM = SPLIT_MINIMUM
 
     # abstract; to be overridden by the concrete classes
     # e.g. NAME = "ABC Service API"
@@ -161,7 +186,7 @@ class Service(object, metaclass=abc.ABCMeta):
         assert isinstance(self.TRAITS, list), \
             "Please specify a TRAITS list for the service"
 
-        self._netops = None
+        self._netlocal = threading.local()
         self._lame_flags = lame_flags
         self._logger = logger
         self.normalize = normalize
@@ -432,11 +457,21 @@ class Service(object, metaclass=abc.ABCMeta):
 
         self._logger.debug("GET %s for headers", url)
         self._netops += 1
-        return requests.request(
+        return self.net_session().request(
             method='GET', url=url, headers={'User-Agent': DEFAULT_UA},
             timeout=DEFAULT_TIMEOUT,
         ).headers
 
+    def net_session(self):  # allows overriding, pylint:disable=no-self-use
+        """
+        Returns the shared HTTP session, which keeps connections alive
+        between requests to the same host. Services making their own web
+        requests should use this rather than calling into the requests
+        module directly.
+        """
+
+        return get_session()
+
     def parse_mime_type(self, raw_mime):
         raw_mime = raw_mime.replace('/x-', '/')
         if 'charset' in raw_mime:
@@ -449,8 +484,9 @@ class Service(object, metaclass=abc.ABCMeta):
                    allow_redirects=True):
         """
         Returns the raw payload string from the specified target(s).
-        If multiple targets are specified, their resulting payloads are
-        glued together.
+        If multiple targets are specified, they are fetched concurrently
+        (up to NET_FANOUT at a time) and their resulting payloads are
+        glued together in the order given.
 
         Each "target" is a bare URL string or a tuple containing an
         address and a dict for what to tack onto the query string.
@@ -471,7 +507,95 @@ class Service(object, metaclass=abc.ABCMeta):
         To prevent redirects one can set allow_redirects to False.
         """
 
-        assert method in ['GET', 'POST'], "method must be GET or POST"
+        require = require or {}
+
+        def fetch(url, params, desc):
+            """Returns the checked payload for one target."""
+
+            response = self._net_open(url, params, desc, require, method,
+                                      awesome_ua, custom_headers,
+                                      allow_redirects)
+            payload = response.content
+            response.close()
+
+            self._net_require_size(len(payload), require, desc)
+            return payload
+
+        payloads = self._net_map(fetch, self._net_targets(targets,
+                                                          custom_quoter))
+
+        if add_padding:
+            payloads.append(PADDING)
+
+        return b''.join(payloads)
+
+    def net_download(self, path, targets, require=None, method='GET',
+                     awesome_ua=False, add_padding=False,
+                     custom_quoter=None, custom_headers=None,
+                     allow_redirects=True):
+        """
+        Downloads a file to the given path from the specified target(s).
+        See net_stream() for information about available options.
+
+        Rather than holding the payloads in memory, each response is
+        streamed into a temporary file next to the path. Once every
+        target has been fetched and has passed the require checks, the
+        files are joined in order and renamed into place. On any
+        failure, the temporary files are removed and the path is left
+        untouched.
+        """
+
+        from tempfile import mkstemp
+
+        require = require or {}
+        directory = os.path.dirname(path) or None
+        parts = []
+
+        def fetch(url, params, desc):
+            """Streams one target into its own file, returning its path."""
+
+            handle, part = mkstemp(prefix='.', suffix='.part', dir=directory)
+            parts.append(part)
+
+            with os.fdopen(handle, 'wb') as output:
+                response = self._net_open(url, params, desc, require, method,
+                                          awesome_ua, custom_headers,
+                                          allow_redirects, stream=True)
+                size = 0
+                try:
+                    for chunk in response.iter_content(NET_CHUNK_SIZE):
+                        output.write(chunk)
+                        size += len(chunk)
+                finally:
+                    response.close()
+
+            self._net_require_size(size, require, desc)
+            return part
+
+        try:
+            ordered = self._net_map(fetch, self._net_targets(targets,
+                                                             custom_quoter))
+
+            if len(ordered) > 1 or add_padding:
+                with open(ordered[0], 'ab') as output:
+                    for part in ordered[1:]:
+                        with open(part, 'rb') as part_input:
+                            shutil.copyfileobj(part_input, output)
+                    if add_padding:
+                        output.write(PADDING)
+
+            os.replace(ordered[0], path)
+            parts.remove(ordered[0])
+
+        finally:
+            self.path_unlink(parts)
+
+    def _net_targets(self, targets, custom_quoter):
+        """
+        Normalizes the targets into a list of URL, query string, and
+        description tuples, counting each one as a network operation.
+        """
+
         from urllib.parse import quote
 
         targets = targets if isinstance(targets, list) else [targets]
@@ -497,88 +621,118 @@ class Service(object, metaclass=abc.ABCMeta):
             for target in targets
         ]
 
-        require = require or {}
-
-        payloads = []
-
-        for number, (url, params) in enumerate(targets, 1):
-            desc = "web request" if len(targets) == 1 \
-                else "web request (%d of %d)" % (number, len(targets))
+        self._netops += len(targets)
 
-            self._logger.debug("%s %s%s%s for %s", method, url,
-                               "?" if params else "", params or "", desc)
+        return [
+            (url, params,
+             "web request" if len(targets) == 1
+             else "web request (%d of %d)" % (number, len(targets)))
+            for number, (url, params) in enumerate(targets, 1)
+        ]
 
-            headers = {'User-Agent': (self.ecosystem.agent
-                                      if awesome_ua else DEFAULT_UA)}
-            if custom_headers:
-                headers.update(custom_headers)
+    def _net_map(self, function, targets):  # pylint:disable=no-self-use
+        """
+        Calls the function with each of the normalized targets, using up
+        to NET_FANOUT threads from the shared executor if there is more
+        than one, and returns the results in the same order. If any call
+        raises, the exception for the earliest such target is raised and
+        calls that have not yet started are cancelled.
+        """
+
+        if len(targets) == 1:
+            return [function(*targets[0])]
+
+        executor = _get_executor()
+        futures = [executor.submit(function, *target)
+                   for target in targets[:NET_FANOUT]]
+        try:  # each result collected lets the next target be submitted
+            results = []
+            for index, future in enumerate(futures):
+                results.append(future.result())
+                if index + NET_FANOUT < len(targets):
+                    futures.append(executor.submit(
+                        function, *targets[index + NET_FANOUT]))
+            return results
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            for future in futures:  # let the ones already running finish
+                if not future.cancelled():
+                    future.exception()
+            raise
+
+    def _net_open(self, url, params, desc, require, method, awesome_ua,
+                  custom_headers, allow_redirects, stream=False):
+        """
+        Makes the request for one target and returns its response, after
+        checking its status and, if required, its MIME type. The caller
+        is responsible for reading, checking the size of, and closing
+        the response.
+        """
 
-            self._netops += 1
-            response = requests.request(
-                method=method,
-                url=('?'.join([url, params]) if params and method == 'GET'
-                     else url),
-                headers=headers,
-                data=params.encode() if params and method == 'POST' else None,
-                timeout=DEFAULT_TIMEOUT,
-            )
+        assert method in ['GET', 'POST'], "method must be GET or POST"
 
-            if not response:
-                raise IOError("No response for %s" % desc)
+        self._logger.debug("%s %s%s%s for %s", method, url,
+                           "?" if params else "", params or "", desc)
 
-            if response.status_code != 200:
-                value_error = ValueError(
-                    "Got %d status for %s" %
-                    (response.status_code, desc)
-                )
-                try:
-                    value_error.payload = response.content
-                    response.close()
-                except Exception:
-                    pass
-                raise value_error
+        headers = {'User-Agent': (self.ecosystem.agent
+                                  if awesome_ua else DEFAULT_UA)}
+        if custom_headers:
+            headers.update(custom_headers)
 
-            got_mime = response.headers['Content-Type']
-            simplified_mime = self.parse_mime_type(got_mime)
+        response = self.net_session().request(
+            method=method,
+            url=('?'.join([url, params]) if params and method == 'GET'
+                 else url),
+            headers=headers,
+            data=params.encode() if params and method == 'POST' else None,
+            timeout=DEFAULT_TIMEOUT,
+            stream=stream,
+        )
 
-            if 'mime' in require and require['mime'] != simplified_mime:
+        if not response:
+            raise IOError("No response for %s" % desc)
 
-                value_error = ValueError(
-                    f"Request got {got_mime} Content-Type for {desc};"
-                    f" wanted {require['mime']}"
-                )
-                value_error.got_mime = got_mime
-                value_error.wanted_mime = require['mime']
-                raise value_error
+        if response.status_code != 200:
+            value_error = ValueError(
+                "Got %d status for %s" %
+                (response.status_code, desc)
+            )
+            try:
+                value_error.payload = response.content
+                response.close()
+            except Exception:
+                pass
+            raise value_error
 
-            if not allow_redirects and response.geturl() != url:
-                raise ValueError("Request has been redirected")
+        got_mime = response.headers['Content-Type']
+        simplified_mime = self.parse_mime_type(got_mime)
 
-            payload = response.content
+        if 'mime' in require and require['mime'] != simplified_mime:
             response.close()
 
-            if 'size' in require and len(payload) < require['size']:
-                raise self.TinyDownloadError(
-                    "Request got %d-byte stream for %s; wanted %d+ bytes" %
-                    (len(payload), desc, require['size'])
-                )
+            value_error = ValueError(
+                f"Request got {got_mime} Content-Type for {desc};"
+                f" wanted {require['mime']}"
+            )
+            value_error.got_mime = got_mime
+            value_error.wanted_mime = require['mime']
+            raise value_error
 
-            payloads.append(payload)
+        if not allow_redirects and response.geturl() != url:
+            response.close()
+            raise ValueError("Request has been redirected")
 
-        if add_padding:
-            payloads.append(PADDING)
+        return response
 
-        return b''.join(payloads)
-
-    def net_download(self, path, *args, **kwargs):
-        """
-        Downloads a file to the given path from the specified target(s).
-        See net_stream() for information about available options.
-        """
+    def _net_require_size(self, size, require, desc):
+        """Raises TinyDownloadError if a payload was under the minimum."""
 
-        payload = self.net_stream(*args, **kwargs)
-        with open(path, 'wb') as response_output:
-            response_output.write(payload)
+        if 'size' in require and size < require['size']:
+            raise self.TinyDownloadError(
+                "Request got %d-byte stream for %s; wanted %d+ bytes" %
+                (size, desc, require['size'])
+            )
 
     def net_dump(self, output_path, url):
         """
@@ -615,18 +769,35 @@ class Service(object, metaclass=abc.ABCMeta):
         if not os.path.exists(output_path):
             raise RuntimeError("Dumping the audio stream w/ mplayer failed.")
 
+    @property
+    def _netops(self):
+        """
+        Number of network ops required by the run in progress on the
+        calling thread. It is kept per thread because the router may run
+        the same service instance for several clips at once.
+        """
+
+        return getattr(self._netlocal, 'count', None)
+
+    @_netops.setter
+    def _netops(self, value):
+        """Sets the network op count for the calling thread."""
+
+        self._netlocal.count = value
+
     def net_count(self):
         """
-        Returns the number of downloads the last run required. Intended
-        for use by the router to query after a run.
+        Returns the number of downloads the last run on this thread
+        required. Intended for use by the router to query after a run,
+        from the thread that did the run.
         """
 
         return self._netops
 
     def net_reset(self):
         """
-        Resets the download count back to zero. Intended for use by the
-        router before a run.
+        Resets this thread's download count back to zero. Intended for
+        use by the router before a run, from the thread doing the run.
         """
 
         self._netops = 0
@@ -750,39 +921,16 @@ class Service(object, metaclass=abc.ABCMeta):
         with open(path, 'ab') as output_stream:
             output_stream.write(PADDING)
 
-    def util_split(self, text, limit):
+    def util_split(self, text, limit, encoding=None):
         """
         Intelligently split a string into smaller bits based on the
         passed limit. This utility function can be helpful for services
-        that have character limits. Returns a list of strings.
-        """
-
-        bits = []
-
-        while len(text) > limit:
-            for symbols in self.SPLIT_PRIORITY:
-                offsets = [
-                    offset
-                    for offset in [
-                        text.rfind(symbol, 0, limit)
-                        for symbol in symbols
-                    ]
-                    if offset > self.SPLIT_MINIMUM
-                ]
-
-                if offsets:
-                    offset = sorted(offsets).pop()
-                    bits.append(text[:offset + 1].rstrip())
-                    text = text[offset + 1:]
-                    break
-
-            else:  # force a mid-word break
-                bits.append(text[:limit])
-                text = text[limit:]
-
-            text = text.lstrip(self.SPLIT_CHARACTERS)
+        that have character limits, or byte limits if an encoding is
+        passed. Returns a list of strings.
+        """
 
-        bits.append(text)
+        bits = segment(text, limit, encoding,
+                       self.SPLIT_PRIORITY, self.SPLIT_MINIMUM)
 
         if len(bits) > 1:
             self._logger.debug(
@@ -7,12 +7,11 @@ https://www.cereproc.com/
 
 import time
 import datetime
-import requests
 import json
 import base64
 from .base import Service
 from .languages import StandardVoice
-from .voicelist import VOICE_LIST
+from . import voicelist
 from typing import List
 
 __all__ = ['CereProc']
@@ -27,6 +26,8 @@ class CereProc(Service):
 
     TRAITS = []
 
+    _voices = voicelist.VoiceIndex('CereProc', StandardVoice)
+
     def desc(self):
         """Returns name with a voice count."""
 
@@ -41,17 +42,10 @@ class CereProc(Service):
         ]
 
     def get_voices(self) -> List[StandardVoice]:
-        voices = [x for x in VOICE_LIST if x['service'] == 'CereProc']
-        voices = sorted(voices, key=lambda x: x['voice_description'])
-        voice_list = []
-        for voice_data in voices:
-            voice_list.append(StandardVoice(voice_data))
-        return voice_list
+        return self._voices.voices()
 
     def get_voice_for_key(self, key) -> StandardVoice:
-        voice = [voice for voice in self.get_voices() if voice.get_key() == key]
-        assert(len(voice) == 1)
-        return voice[0]
+        return self._voices.get(key)
 
     def get_voice_list(self):
         voice_list = self.get_voices()
@@ -74,7 +68,7 @@ class CereProc(Service):
         headers = {'authorization': f'Basic {auth_string}'}
 
         auth_url = 'https://api.cerevoice.com/v2/auth'
-        response = requests.get(auth_url, headers=headers)
+        response = self.net_session().get(auth_url, headers=headers)
 
         access_token = response.json()['access_token']
         return access_token
@@ -109,7 +103,7 @@ class CereProc(Service):
 
             url = f'https://api.cerevoice.com/v2/speak?voice={voice_name}&audio_format=mp3'
             # logging.debug(f'querying url: {url}')            
-            response = requests.post(url, data=ssml_text, headers=self.get_auth_headers(username, password))
+            response = self.net_session().post(url, data=ssml_text, headers=self.get_auth_headers(username, password))
 
             if response.status_code == 200:
                 with open(path, 'wb') as audio:
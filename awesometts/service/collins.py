@@ -23,7 +23,7 @@ Service implementation for the Collins Dictionary
 import re
 
 from .base import Service
-from .common import Trait
+from .common import NotFound, Trait
 
 __all__ = ['Collins']
 
@@ -138,5 +138,5 @@ class Collins(Service):
                 break
 
         else:
-            raise IOError("Cannot find any recorded audio in Collins "
-                          "dictionary for this input.")
+            raise NotFound("Cannot find any recorded audio in Collins "
+                           "dictionary for this input.")
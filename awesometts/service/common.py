@@ -20,10 +20,19 @@
 Common classes for services
 
 Provides an enum-like Trait class for specifying the characteristics of
-a service.
+a service and the NotFound exception for dictionary lookups.
 """
 
-__all__ = ['Trait']
+__all__ = ['NotFound', 'Trait']
+
+
+class NotFound(IOError):
+    """
+    Raised by a dictionary service that has no recording for the input.
+    Unlike a network, quota, or account error, this will not go away if
+    the same input is tried again later, so the router remembers it for
+    much longer.
+    """
 
 
 class Trait(object):  # enum class, pylint:disable=R0903
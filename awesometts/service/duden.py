@@ -27,7 +27,7 @@ from unicodedata import normalize as unicode_normalize
 import urllib
 
 from .base import Service
-from .common import Trait
+from .common import NotFound, Trait
 
 __all__ = ['Duden']
 
@@ -131,7 +131,7 @@ class Duden(Service):
         correct_candidates = [x for x in definition_candidates if process_candidate_definition(x['word']) == text]
         if len(correct_candidates) == 0:
             error_message = f"Couldn't find definition for {text} on page {search_url}"
-            raise IOError(error_message)
+            raise NotFound(error_message)
 
         # pick the first one
         candidate = correct_candidates[0]
@@ -153,7 +153,7 @@ class Duden(Service):
         sound_element = soup.find('a', {'class':'pronunciation-guide__sound'})
         if sound_element == None:
             error_message = f"Couldn't find pronunciation for word [{text}] on page {definition_url}"
-            raise IOError(error_message)
+            raise NotFound(error_message)
 
         self._logger.debug(f'sound_element: {sound_element}')
         mp3_url = sound_element['href']
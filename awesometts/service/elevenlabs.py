@@ -7,12 +7,11 @@ https://beta.elevenlabs.io/
 
 import time
 import datetime
-import requests
 import json
 import base64
 from .base import Service
 from .languages import StandardVoice
-from .voicelist import VOICE_LIST
+from . import voicelist
 from typing import List
 
 SERVICE_NAME = 'ElevenLabs'
@@ -30,6 +29,9 @@ class ElevenLabs(Service):
 
     TRAITS = []
 
+    _voices = voicelist.VoiceIndex(SERVICE_NAME, StandardVoice,
+                                   key=lambda voice: voice.get_voice_key())
+
     def desc(self):
         """Returns name with a voice count."""
 
@@ -44,18 +46,10 @@ class ElevenLabs(Service):
         ]
 
     def get_voices(self) -> List[StandardVoice]:
-        voices = [x for x in VOICE_LIST if x['service'] == SERVICE_NAME]
-        voices = sorted(voices, key=lambda x: x['voice_description'])
-        voice_list = []
-        for voice_data in voices:
-            voice_list.append(StandardVoice(voice_data))
-        assert len(voice_list) > 0
-        return voice_list
+        return self._voices.voices()
 
     def get_voice_for_key(self, key) -> StandardVoice:
-        voice = [voice for voice in self.get_voices() if voice.get_voice_key() == key]
-        assert(len(voice) == 1)
-        return voice[0]
+        return self._voices.get(key)
 
     def get_voice_list(self):
         voice_list = self.get_voices()
@@ -121,7 +115,7 @@ class ElevenLabs(Service):
                 }
             }
 
-            response = requests.post(url, json=data, headers=headers)
+            response = self.net_session().post(url, json=data, headers=headers)
             response.raise_for_status()
 
             with open(path, 'wb') as audio:
@@ -22,9 +22,8 @@ Service implementation for Forvo Pronunciation API
 
 import json
 from .base import Service
-from .common import Trait
+from .common import NotFound, Trait
 import urllib
-import requests
 
 __all__ = ['Forvo']
 
@@ -822,7 +821,7 @@ class Forvo(Service):
 
             # run request
             headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:85.0) Gecko/20100101 Firefox/85.0'}
-            response = requests.get(url, headers=headers)
+            response = self.net_session().get(url, headers=headers)
             self._logger.debug(f'response.content: {response.content}')
 
             if response.status_code == 200:
@@ -835,7 +834,7 @@ class Forvo(Service):
                     items = data['items']
                 if len(items) == 0:
                     message = f"Pronunciation not found in Forvo for word [{text}], language={options['voice']}, sex={sex}, country={options['country']}"
-                    raise IOError(message)
+                    raise NotFound(message)
                 audio_url = items[0]['pathmp3']
                 for item in items:
                     if item['word'] == text:
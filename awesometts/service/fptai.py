@@ -22,11 +22,10 @@ https://fpt.ai/tts
 """
 
 from .base import Service
-import requests
 import json
 import time
 from .languages import StandardVoice
-from .voicelist import VOICE_LIST
+from . import voicelist
 from typing import List
 
 __all__ = ['FptAi']
@@ -45,6 +44,9 @@ class FptAi(Service):
 
     TRAITS = []
 
+    _voices = voicelist.VoiceIndex('FptAi', StandardVoice,
+                                   key=lambda voice: voice.get_voice_key())
+
     def desc(self):
         """Returns name with a voice count."""
 
@@ -61,12 +63,7 @@ class FptAi(Service):
 
 
     def get_voices(self) -> List[StandardVoice]:
-        naver_voices = [x for x in VOICE_LIST if x['service'] == 'FptAi']
-        naver_voices = sorted(naver_voices, key=lambda x: x['voice_description'])
-        voice_list = []
-        for voice_data in naver_voices:
-            voice_list.append(StandardVoice(voice_data))
-        return voice_list        
+        return self._voices.voices()
 
     def get_voice_list(self):
         voice_list = [(voice.get_voice_key(), voice.get_description()) for voice in self.get_voices()]
@@ -74,9 +71,7 @@ class FptAi(Service):
         return voice_list
 
     def get_voice_for_key(self, key) -> StandardVoice:
-        voice = [voice for voice in self.get_voices() if voice.get_voice_key() == key]
-        assert(len(voice) == 1)
-        return voice[0]
+        return self._voices.get(key)
 
     def options(self):
         """Provides access to voice and speed."""
@@ -125,7 +120,7 @@ class FptAi(Service):
 
             api_url = "https://api.fpt.ai/hmi/tts/v5"
             body = text
-            response = requests.post(api_url, headers=headers, data=body.encode('utf-8'))
+            response = self.net_session().post(api_url, headers=headers, data=body.encode('utf-8'))
 
             self._logger.debug(f'executing POST on {api_url} with headers {headers}, text: {text}')
 
@@ -152,7 +147,7 @@ class FptAi(Service):
             wait_time = 0.2
             while audio_available == False and max_tries > 0:
                 time.sleep(wait_time)
-                r = requests.get(async_url, allow_redirects=True)
+                r = self.net_session().get(async_url, allow_redirects=True)
                 self._logger.debug(f"status code: {r.status_code}")
                 if r.status_code == 200:
                     audio_available = True
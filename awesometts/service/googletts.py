@@ -22,7 +22,6 @@ Service implementation for Google Cloud Text-to-Speech API
 """
 
 import base64
-import requests
 
 from hashlib import sha1
 from typing import List
@@ -31,7 +30,7 @@ from .base import Service
 from .common import Trait
 
 from .languages import StandardVoice
-from .voicelist import VOICE_LIST
+from . import voicelist
 
 __all__ = ['GoogleTTS']
 
@@ -47,6 +46,8 @@ class GoogleTTS(Service):
 
     TRAITS = [Trait.INTERNET]
 
+    _voices = voicelist.VoiceIndex('Google', StandardVoice)
+
     _audio_device_profile = [
         ("default", "Default"),
         ("wearable-class-device", "Smart watches and other wearables, like Apple Watch, Wear OS watch"),
@@ -84,22 +85,14 @@ class GoogleTTS(Service):
         return [dict(key='key', label="API Key", required=True)]
 
     def get_voices(self) -> List[StandardVoice]:
-        voices = [x for x in VOICE_LIST if x['service'] == 'Google']
-        voices = sorted(voices, key=lambda x: x['voice_description'])
-        voice_list = []
-        for voice_data in voices:
-            voice_list.append(StandardVoice(voice_data))
-        return voice_list        
+        return self._voices.voices()
 
     def get_voice_list(self):
         sorted_voices = self.get_voices()
-        sorted_voices.sort(key=lambda x: x.get_description())
         return [(voice.get_key(), voice.get_description()) for voice in sorted_voices]
 
     def get_voice_for_key(self, key) -> StandardVoice:
-        voice = [voice for voice in self.get_voices() if voice.get_key() == key]
-        assert(len(voice) == 1)
-        return voice[0]
+        return self._voices.get(key)
 
     def options(self):
         """
@@ -181,7 +174,7 @@ class GoogleTTS(Service):
             if options['profile'] != 'default':
                 payload["audioConfig"]["effectsProfileId"] = [options['profile']]
 
-            r = requests.post("https://texttospeech.googleapis.com/v1/text:synthesize?key={}".format(options['key']), headers=headers, json=payload)
+            r = self.net_session().post("https://texttospeech.googleapis.com/v1/text:synthesize?key={}".format(options['key']), headers=headers, json=payload)
             r.raise_for_status()
 
             data = r.json()
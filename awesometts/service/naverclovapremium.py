@@ -23,13 +23,12 @@ https://apidocs.ncloud.com/en/ai-naver/clova_premium_voice/tts/
 
 import time
 import datetime
-import requests
-import urllib
+import urllib.parse
 from .base import Service
 from .languages import Language
 from .languages import Gender
 from .languages import StandardVoice
-from .voicelist import VOICE_LIST
+from . import voicelist
 from typing import List
 
 __all__ = ['NaverClovaPremium']
@@ -50,10 +49,12 @@ class NaverClovaPremium(Service):
     # to rate-limit it or trigger error caching behavior
     TRAITS = []
 
+    _voices = voicelist.VoiceIndex('Naver', StandardVoice)
+
     def desc(self):
         """Returns name with a voice count."""
 
-        return "Naver Clova Premium TTS API (%d voices)" % len(VOICE_LIST)
+        return "Naver Clova Premium TTS API (%d voices)" % voicelist.count('Naver')
 
     def extras(self):
         """The Azure API requires an API key."""
@@ -65,12 +66,7 @@ class NaverClovaPremium(Service):
             dict(key='clientsecret', label="API Client Secret", required=True)]
     
     def get_voices(self) -> List[StandardVoice]:
-        naver_voices = [x for x in VOICE_LIST if x['service'] == 'Naver']
-        naver_voices = sorted(naver_voices, key=lambda x: x['voice_description'])
-        voice_list = []
-        for voice_data in naver_voices:
-            voice_list.append(StandardVoice(voice_data))
-        return voice_list        
+        return self._voices.voices()
 
     def get_voice_list(self):
         voice_list = [(voice.get_key(), voice.get_description()) for voice in self.get_voices()]
@@ -78,9 +74,7 @@ class NaverClovaPremium(Service):
         return voice_list
 
     def get_voice_for_key(self, key) -> StandardVoice:
-        voice = [voice for voice in self.get_voices() if voice.get_key() == key]
-        assert(len(voice) == 1)
-        return voice[0]
+        return self._voices.get(key)
 
     def options(self):
 
@@ -134,14 +128,16 @@ class NaverClovaPremium(Service):
             data = f"speaker={voice_name}&speed={speed}&pitch={pitch}&text={encText}"
             url = 'https://naveropenapi.apigw.ntruss.com/tts-premium/v1/tts'
             self._logger.debug(f"url: {url}, data: {data}")
-            request = urllib.request.Request(url)
-            request.add_header("X-NCP-APIGW-API-KEY-ID",client_id)
-            request.add_header("X-NCP-APIGW-API-KEY",client_secret)
-            response = urllib.request.urlopen(request, data=data.encode('utf-8'))
-            rescode = response.getcode()
+            headers = {
+                'X-NCP-APIGW-API-KEY-ID': client_id,
+                'X-NCP-APIGW-API-KEY': client_secret,
+                'Content-Type': 'application/x-www-form-urlencoded',
+            }
+            response = self.net_session().post(url, headers=headers, data=data.encode('utf-8'))
+            rescode = response.status_code
             if(rescode==200):
                 self._logger.debug("successful response")
-                response_body = response.read()
+                response_body = response.content
                 with open(path, 'wb') as f:
                     f.write(response_body)
             else:
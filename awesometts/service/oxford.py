@@ -24,7 +24,7 @@ import re
 from html.parser import HTMLParser
 
 from .base import Service
-from .common import Trait
+from .common import NotFound, Trait
 
 __all__ = ['Oxford']
 
@@ -156,7 +156,7 @@ class Oxford(Service):
             self._logger.debug(f'retrieved url {dict_url} successfully')
         except IOError as io_error:
             if getattr(io_error, 'code', None) == 404:
-                raise IOError(
+                raise NotFound(
                     "The Oxford Dictionary does not recognize this phrase. "
                     "While most single words are recognized, many multi-word "
                     "phrases are not."
@@ -167,7 +167,7 @@ class Oxford(Service):
                 raise
         except ValueError as error:
             if str(error) == "Request has been redirected":
-                raise IOError(
+                raise NotFound(
                     "The Oxford Dictionary has no exact match for your input. "
                     "You can enable fuzzy-matching in options."
                 )
@@ -185,14 +185,15 @@ class Oxford(Service):
                 sound_url,
                 require=dict(mime='audio/mpeg', size=1024),
             )
-        else:
+        elif options['voice'] == 'en-US':
+            # not proof the word is missing, so not remembered as NotFound
             raise IOError(
                 "The Oxford Dictionary does not currently seem to be "
                 "advertising American English pronunciation. You may want to "
                 "consider either using a different service or switching to "
                 "British English."
-                if options['voice'] == 'en-US'
-
-                else
+            )
+        else:
+            raise NotFound(
                 "The Oxford Dictionary has no recorded audio for your input."
             )
@@ -3,13 +3,12 @@ Service implementation for VocalWare TTS service
 """
 
 from .base import Service
-import requests
 import json
 import time
 import urllib
 import hashlib
 from .languages import StandardVoice
-from .voicelist import VOICE_LIST
+from . import voicelist
 from typing import List
 
 __all__ = ['VocalWare']
@@ -25,6 +24,9 @@ class VocalWare(Service):
 
     TRAITS = []
 
+    _voices = voicelist.VoiceIndex('VocalWare', StandardVoice,
+                                   key=lambda voice: voice.get_voice_key())
+
     def desc(self):
         """Returns name with a voice count."""
 
@@ -45,12 +47,7 @@ class VocalWare(Service):
 
 
     def get_voices(self) -> List[StandardVoice]:
-        voices = [x for x in VOICE_LIST if x['service'] == 'VocalWare']
-        voices = sorted(voices, key=lambda x: x['voice_description'])
-        voice_list = []
-        for voice_data in voices:
-            voice_list.append(StandardVoice(voice_data))
-        return voice_list        
+        return self._voices.voices()
 
     def get_voice_list(self):
         voice_list = [(voice.get_voice_key(), voice.get_description()) for voice in self.get_voices()]
@@ -58,9 +55,7 @@ class VocalWare(Service):
         return voice_list
 
     def get_voice_for_key(self, key) -> StandardVoice:
-        voice = [voice for voice in self.get_voices() if voice.get_voice_key() == key]
-        assert(len(voice) == 1)
-        return voice[0]
+        return self._voices.get(key)
 
     def options(self):
         """Provides access to voice and speed."""
@@ -100,7 +95,7 @@ class VocalWare(Service):
             url_parameters = f"""EID={voice_key['engine_id']}&LID={voice_key['language_id']}&VID={voice_key['voice_id']}&TXT={urlencoded_text}&ACC={account_id}&API={api_id}&CS={checksum}"""
             url = f"""http://www.vocalware.com/tts/gen.php?{url_parameters}"""
 
-            response = requests.get(url)
+            response = self.net_session().get(url)
             if response.status_code == 200:
                 with open(path, 'wb') as audio:
                     audio.write(response.content)
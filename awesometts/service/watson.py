@@ -7,11 +7,10 @@ https://cloud.ibm.com/docs/text-to-speech?topic=text-to-speech-gettingStarted
 
 import time
 import datetime
-import requests
 import json
 from .base import Service
 from .languages import StandardVoice
-from .voicelist import VOICE_LIST
+from . import voicelist
 from typing import List
 
 __all__ = ['Watson']
@@ -28,6 +27,8 @@ class Watson(Service):
 
     TRAITS = []
 
+    _voices = voicelist.VoiceIndex('Watson', StandardVoice)
+
     def desc(self):
         """Returns name with a voice count."""
 
@@ -42,17 +43,10 @@ class Watson(Service):
         ]
 
     def get_voices(self) -> List[StandardVoice]:
-        voices = [x for x in VOICE_LIST if x['service'] == 'Watson']
-        voices = sorted(voices, key=lambda x: x['voice_description'])
-        voice_list = []
-        for voice_data in voices:
-            voice_list.append(StandardVoice(voice_data))
-        return voice_list
+        return self._voices.voices()
 
     def get_voice_for_key(self, key) -> StandardVoice:
-        voice = [voice for voice in self.get_voices() if voice.get_key() == key]
-        assert(len(voice) == 1)
-        return voice[0]
+        return self._voices.get(key)
 
 
     def get_voice_list(self):
@@ -111,7 +105,7 @@ class Watson(Service):
             }
 
             self._logger.info(f'data: {data}')
-            response = requests.post(constructed_url, data=json.dumps(data), auth=('apikey', api_key), headers=headers)
+            response = self.net_session().post(constructed_url, data=json.dumps(data), auth=('apikey', api_key), headers=headers)
 
             if response.status_code == 200:
                 with open(path, 'wb') as audio:
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# AwesomeTTS text-to-speech add-on for Anki
+# Copyright (C) 2010-Present  Anki AwesomeTTS Development Team
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Shared HTTP session with keep-alive connection pooling
+
+Every web request made by the services and the Language Tools client
+goes through a single requests.Session so that connections to a given
+host are reused instead of paying for a fresh TCP and TLS handshake on
+each clip.
+"""
+
+from http.cookiejar import DefaultCookiePolicy
+from threading import Lock
+
+import requests
+import requests.adapters
+
+__all__ = ['get_session']
+
+
+POOL_HOSTS = 16    # number of distinct hosts to keep connection pools for
+POOL_MAXSIZE = 32  # keep-alive connections per host (>= workers x fan-out)
+TIMEOUT = 30       # seconds to connect or wait for data if no timeout given
+
+_LOCK = Lock()
+_SESSION = None
+
+
+class _TimeoutAdapter(requests.adapters.HTTPAdapter):
+    """
+    Transport adapter that applies TIMEOUT to any request made without
+    its own timeout, so that a hung connection cannot hold one of the
+    router's worker threads forever.
+    """
+
+    def send(self, request, timeout=None, **kwargs):  # pylint:disable=W0221
+        """Sends the request, with TIMEOUT if no timeout was passed."""
+
+        return super(_TimeoutAdapter, self).send(
+            request,
+            timeout=TIMEOUT if timeout is None else timeout,
+            **kwargs
+        )
+
+
+def get_session():
+    """
+    Returns the shared session, creating it on first use.
+
+    The underlying urllib3 connection pools are thread-safe. Cookies are
+    never stored, so one service (or one worker thread) cannot leak state
+    into another, matching the old per-call requests.request() behavior.
+    Requests made without a timeout get TIMEOUT.
+    """
+
+    global _SESSION  # pylint:disable=global-statement
+
+    if _SESSION is None:
+        with _LOCK:
+            if _SESSION is None:
+                session = requests.Session()
+                session.cookies.set_policy(DefaultCookiePolicy(
+                    allowed_domains=[],
+                ))
+
+                adapter = _TimeoutAdapter(
+                    pool_connections=POOL_HOSTS,
+                    pool_maxsize=POOL_MAXSIZE,
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+
+                _SESSION = session
+
+    return _SESSION
@@ -20,10 +20,13 @@
 Basic manipulation and sanitization of input text
 """
 
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import accumulate
 import re
 from io import StringIO
+from threading import Lock
 
-from bs4 import BeautifulSoup
 import html
 import anki
 
@@ -31,8 +34,9 @@ clozeReg = r"(?si)\{\{(?P<tag>c)%s::(?P<content>.*?)(::(?P<hint>.*?))?\}\}"
 
 __all__ = ['RE_CLOZE_BRACED', 'RE_CLOZE_RENDERED', 'RE_ELLIPSES',
            'RE_ELLIPSES_LEADING', 'RE_ELLIPSES_TRAILING', 'RE_FILENAMES',
-           'RE_HINT_LINK', 'RE_LINEBREAK_HTML', 'RE_NEWLINEISH', 'RE_SOUNDS',
-           'RE_WHITESPACE', 'STRIP_HTML', 'Sanitizer']
+           'RE_HINT_LINK', 'RE_LINEBREAK_HTML', 'RE_NEWLINEISH',
+           'RE_SENTENCE_END', 'RE_SOUNDS', 'RE_WHITESPACE', 'SPLIT_MINIMUM',
+           'SPLIT_PRIORITY', 'STRIP_HTML', 'Sanitizer', 'segment', 'sentences']
 
 
 RE_CLOZE_BRACED = re.compile(clozeReg % r'\d+')
@@ -52,45 +56,140 @@ RE_LINEBREAK_HTML = re.compile(r'<\s*/?\s*(br|div|p)(\s+[^>]*)?\s*/?\s*>',
                                re.IGNORECASE)
 RE_NEWLINEISH = re.compile(r'(\r|\n|<\s*/?\s*(br|div|p)(\s+[^>]*)?\s*/?\s*>)+',
                            re.IGNORECASE)
+RE_SENTENCE_END = re.compile(r'(?<=[.?!])(?P<latin>\s+)|'  # not e.g. "3.14"
+                             r'(?<=[\u3002\uff01\uff0e\uff1f])(?P<wide>\s*)')
 RE_SOUNDS = re.compile(r'\[sound:(.*?)\]')  # see also anki.sound._soundReg
 RE_WHITESPACE = re.compile(r'[\0\s]+', re.UNICODE)
 
 STRIP_HTML = anki.utils.strip_html  # this also converts character entities
 
+MEMO_SIZE = 1000  # number of recent results each Sanitizer remembers
+
+SPLIT_PRIORITY = [  # places to break long text, most preferred first
+    ['.', '?', '!', '\u3002', '\uff01', '\uff0e', '\uff1f'],
+    [',', ';', ':', '\u3001', '\uff0c', '\uff1a', '\uff1b'],
+    [' ', '\u3000'],
+    ['-', '\u2027', '\u30fb'],
+]
+
+SPLIT_MINIMUM = 5  # breaks this close to the start of a segment are skipped
+
 
 class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
-    """Once instantiated, provides a callable to sanitize text."""
+    """
+    Once instantiated, provides a callable to sanitize text.
+
+    The rules are compiled into a list of steps, each a bound rule
+    method with its configuration arguments already looked up, so that
+    calls do not have to interpret the rules. If a config is given, the
+    steps are recompiled whenever one of the options they use changes.
+
+    The most recent results are remembered, keyed by the text and the
+    config revision that the steps were compiled at, so sanitizing the
+    same text again is a lookup until the options change.
+    """
 
     # _rule_xxx() methods are in-class for getattr, pylint:disable=no-self-use
 
     __slots__ = [
-        '_config',  # dict-like interface for looking up config conditionals
-        '_logger',  # logger-like interface for debugging the Sanitizer
-        '_rules',   # list of rules that this instance's callable will process
+        '_config',   # dict-like interface for looking up config conditionals
+        '_logger',   # logger-like interface for debugging the Sanitizer
+        '_applied',  # list of descriptions of the steps, for logging
+        '_lock',     # mutex guarding the memo, as callers may be threaded
+        '_memo',     # OrderedDict of (revision, text) to result, LRU first
+        '_memo_size',  # maximum number of results to remember
+        '_revision',  # config revision when the steps were last compiled
+        '_rules',    # list of rules that this instance's callable will process
+        '_stats',    # dict of hit and miss counts for the memo
+        '_steps',    # list of callables compiled from the rules
     ]
 
-    def __init__(self, rules, config=None, logger=None):
+    def __init__(self, rules, config=None, logger=None, memo_size=MEMO_SIZE):
         self._rules = rules
         self._config = config
         self._logger = logger
+        self._applied = self._steps = self._revision = None
+
+        self._lock = Lock()
+        self._memo = OrderedDict()
+        self._memo_size = memo_size
+        self._stats = dict(hits=0, misses=0)
+
+        self._compile()
+
+        if config is not None:
+            keys = set()
+            for rule in rules:
+                if isinstance(rule, tuple):
+                    keys.update(rule[1] if isinstance(rule[1], list)
+                                else [rule[1]])
+                    keys.update(rule[2:])
+            if keys:
+                config.bind(sorted(keys), lambda config: self._compile())
 
     def __call__(self, text):
-        """Apply the initialized rules against the text and return."""
+        """Apply the compiled rules against the text and return."""
 
-        self._logger.debug(f'input text: [{text}]')
+        # n.b. _compile() sets the revision last, so reading it first
+        # means the steps read after it cannot be older than it is
+        key = self._revision, text
 
-        applied = []
+        with self._lock:
+            try:
+                result = self._memo[key]
+            except KeyError:
+                self._stats['misses'] += 1
+            else:
+                self._memo.move_to_end(key)
+                self._stats['hits'] += 1
+                self._log("remembered result", result)
+                return result
 
-        for rule in self._rules:
-            self._logger.debug(f'evaluating rule: {rule}')
+        result = self._apply(text)
+
+        with self._lock:
+            self._memo[key] = result
+            while len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+
+        return result
+
+    def stats(self):
+        """
+        Returns a dict with the number of remembered results and how
+        many calls have hit or missed them so far.
+        """
+
+        with self._lock:
+            return dict(self._stats, count=len(self._memo),
+                        limit=self._memo_size)
 
+    def _apply(self, text):
+        """Runs each of the compiled steps against the text."""
+
+        applied = self._applied
+
+        for number, step in enumerate(self._steps):
             if not text:
-                self._log(applied + ["early exit"], '')
+                self._log(applied[:number] + ["early exit"], '')
                 return ''
 
+            text = step(text)
+
+        self._log(applied, text)
+        return text
+
+    def _compile(self):
+        """
+        Resolves the rules against the current configuration, dropping
+        rules that are switched off, and stores the resulting steps.
+        """
+
+        steps = []
+
+        for rule in self._rules:
             if isinstance(rule, str):  # always run these rules
-                applied.append(rule)
-                text = getattr(self, '_rule_' + rule)(text)
+                steps.append((rule, getattr(self, '_rule_' + rule)))
 
             elif isinstance(rule, tuple):  # rule that depends on config
                 try:
@@ -99,6 +198,7 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
                     addl = None
                 key = rule[1]
                 rule = rule[0]
+                method = getattr(self, '_rule_' + rule)
 
                 # if the "key" is actually a list, then we will return True
                 # for `value` if ANY key in the list yields a truthy config
@@ -109,29 +209,45 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
                 if value is True:  # basic on/off config flag
                     if addl:
                         addl = self._config[addl]
-                        applied.append((rule, addl))
-                        text = getattr(self, '_rule_' + rule)(text, addl)
+                        steps.append(((rule, addl),
+                                      _bind_args(method, addl)))
 
                     else:
-                        applied.append(rule)
-                        text = getattr(self, '_rule_' + rule)(text)
+                        steps.append((rule, method))
 
                 elif value:  # some other truthy value that drives the rule
-                    if addl:
+                    if rule == 'custom_sub':
+                        steps.append(((rule, value),
+                                      _bind_args(method,
+                                                 _Substitutions(value))))
+
+                    elif addl:
                         addl = self._config[addl]
-                        applied.append((rule, value, addl))
-                        text = getattr(self, '_rule_' + rule)(text, value,
-                                                              addl)
+                        steps.append(((rule, value, addl),
+                                      _bind_args(method, value, addl)))
 
                     else:
-                        applied.append((rule, value))
-                        text = getattr(self, '_rule_' + rule)(text, value)
+                        steps.append(((rule, value),
+                                      _bind_args(method, value)))
 
             else:
                 raise AssertionError("bad rule given to Sanitizer instance")
 
-        self._log(applied, text)
-        return text
+        # neighboring HTML-aware rules can share one pass over the markup
+        fused = []
+        for desc, step in steps:
+            if desc in _Markup.RULES:
+                rules = (fused.pop()[1].rules
+                         if fused and isinstance(fused[-1][1], _Markup)
+                         else []) + [desc]
+                fused.append((('markup', rules), _Markup(rules)))
+            else:
+                fused.append((desc, step))
+
+        self._applied = [desc for desc, _ in fused]
+        self._steps = [step for _, step in fused]
+        self._revision = (self._config.revision() if self._config is not None
+                          else 0)
 
     def _log(self, method, result):
         """If we have a logger, send debug line for transformation."""
@@ -140,6 +256,11 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
             self._logger.debug("Transformation using %s: %s", method,
                                "(empty string)" if result == '' else result)
 
+    def _normalize(self, text):
+        """Runs the ellipsis and whitespace rules, in that order."""
+
+        return self._rule_whitespace(self._rule_ellipses(text))
+
     def _rule_char_ellipsize(self, text, chars):
         """Ellipsizes given chars from the text."""
 
@@ -214,15 +335,7 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
         contents of that span.
         """
 
-        revealed_tags = BeautifulSoup(text, features="html.parser")('span', attrs={'class': 'cloze'})
-
-        return ' ... '.join(
-            ''.join(
-                str(content)
-                for content in tag.contents
-            )
-            for tag in revealed_tags
-        ) if revealed_tags else text
+        return _Markup(['clozes_revealed'])(text)
 
     def _rule_counter(self, text, characters, wrap):
         """
@@ -247,24 +360,11 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
     def _rule_custom_sub(self, text, rules):
         """
         Upon encountering text that matches one of the user's compiled
-        rules, make a replacement. Run whitespace and ellipsis rules
-        before each one.
+        rules, make a replacement. Whitespace and ellipses are handled
+        as if normalized before each one (see _Substitutions).
         """
 
-        self._logger.debug(f'running _rule_custom_sub')
-
-        for rule in rules:
-            self._logger.debug(f'evaluating {rule}')
-
-            text = self._rule_whitespace(self._rule_ellipses(text))
-            if not text:
-                return ''
-
-            text = rule['compiled'].sub(rule['replace'], text)
-            if not text:
-                return ''
-
-        return text
+        return rules(text, self._normalize)
 
     def _rule_ellipses(self, text):
         """
@@ -291,12 +391,7 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
         Removes hint content from the use of a {{hint:xxx}} field.
         """
 
-        soup = BeautifulSoup(text, 'html.parser')
-        hints = soup.findAll('div', attrs={'class': 'hint'})
-        while hints:
-            hints.pop().extract()
-
-        return str(soup)
+        return _Markup(['hint_content'])(text)
 
     def _rule_hint_links(self, text):
         """
@@ -375,16 +470,11 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
         return _aux_within(text, '(', ')')
 
     def _rule_ruby_tags(self, text):
-        self._logger.debug(f'looking for ruby tags')
-        if 'ruby' in text:
-            self._logger.debug(f'found ruby tags, processing')
-            soup = BeautifulSoup(text, features="html.parser")
-            rt_tags = soup.find_all('rt')
-            for rt_tag in rt_tags:
-                self._logger.debug(f'found rt tag {rt_tag}')
-                rt_tag.string = ''
-            return str(soup)
-        return text
+        """
+        Removes the furigana (i.e. <rt> contents) from ruby markup.
+        """
+
+        return _Markup(['ruby_tags'])(text)
 
     def _rule_xml_entities(self, text):
         # not all html entities should be replaced, so we can maintain a map here
@@ -399,6 +489,407 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
         return text
 
 
+def segment(text, limit, encoding=None,
+            priority=SPLIT_PRIORITY, minimum=SPLIT_MINIMUM):
+    """
+    Splits text into a list of segments that are each at most limit
+    characters long (or limit bytes, if an encoding is given).
+
+    Each segment ends at the last break from the earliest tier of the
+    priority list that fits, i.e. after a sentence if possible, then a
+    clause, then a word, then a hyphen, and only mid-word if nothing
+    else fits. Separators leading a segment are dropped, as is any
+    whitespace trailing one that was broken on punctuation.
+
+    All of the breaks are found in a single scan up front, and each
+    segment then only needs a binary search per tier to find its end,
+    so long text is never rescanned or copied as it is consumed.
+    """
+
+    separators = set(symbol for symbols in priority for symbol in symbols)
+    breaks = [[] for _ in priority]
+    for match in re.finditer(
+            '|'.join('([%s])' % ''.join(re.escape(symbol)
+                                        for symbol in symbols)
+                     for symbols in priority),
+            text,
+    ):
+        breaks[match.lastindex - 1].append(match.start())
+
+    # size of text[:i] in characters or bytes is at offsets[i]
+    offsets = ([0] + list(accumulate(len(char.encode(encoding))
+                                     for char in text)) if encoding
+               else range(len(text) + 1))
+
+    segments = []
+    start = 0
+
+    while offsets[-1] - offsets[start] > limit and len(text) - start > 1:
+        end = max(bisect_right(offsets, offsets[start] + limit) - 1,
+                  start + 1)  # always take at least one character
+
+        for offsets_of_tier in breaks:
+            i = bisect_left(offsets_of_tier, end)
+            if i and offsets_of_tier[i - 1] - start > minimum:
+                offset = offsets_of_tier[i - 1] + 1
+                segments.append(text[start:offset].rstrip())
+                break
+
+        else:  # force a mid-word break
+            offset = end
+            segments.append(text[start:offset])
+
+        start = offset
+        while start < len(text) and text[start] in separators:
+            start += 1
+
+    segments.append(text[start:])
+    return segments
+
+
+def sentences(text, limit=0, minimum=SPLIT_MINIMUM):
+    """
+    Splits text into a list of its sentences, with any sentence still
+    longer than limit characters (if given) split further by segment().
+
+    As in segment(), a sentence break this close to the start of the
+    sentence is skipped, which keeps e.g. "Mr. Smith" together. This
+    does not apply after full-width terminators, which do not end
+    abbreviations, and whose sentences can be just a few characters.
+    """
+
+    pieces = []
+    start = 0
+
+    for match in RE_SENTENCE_END.finditer(text):
+        if match.lastgroup == 'wide' or match.start() - start > minimum:
+            pieces.append(text[start:match.start()])
+            start = match.end()
+
+    pieces.append(text[start:])
+
+    return [
+        part
+        for piece in pieces
+        for part in (segment(piece.strip(), limit)
+                     if limit > 0 and len(piece.strip()) > limit
+                     else [piece.strip()])
+        if part.strip()
+    ]
+
+
+class _Substitutions(object):  # call only, pylint:disable=R0903
+    """
+    Applies a list of the user's compiled substitution rules in order,
+    giving the same result as normalizing the text and then running
+    the rule, one rule at a time, but without doing all of that work.
+
+    Normalization is only rerun if the text has changed since it was
+    last normalized. Normalizing already normalized text is a no-op,
+    unless the original had null characters (which the ellipsis rule
+    does not treat as whitespace), so that case is tracked, too.
+
+    Runs of literal (non-regex) rules that share the same flags are
+    searched with combined trie patterns, over a binary tree of the
+    run, so that the rules that would not change the text can be
+    skipped in a few scans rather than one scan per rule.
+    """
+
+    __slots__ = [
+        '_finders',  # dict of (start, end) to combined pattern for rules
+        '_runs',     # list of (start, end) of each rule's literal run
+        '_rules',    # list of rules, each with a 'compiled' matcher
+    ]
+
+    def __init__(self, rules):
+        self._rules = rules
+        self._finders = {}
+        self._runs = runs = [None] * len(rules)
+
+        start = 0
+        for i in range(1, len(rules) + 1):
+            if (i == len(rules) or
+                    not self._literal(start) or not self._literal(i) or
+                    rules[i]['compiled'].flags !=
+                    rules[start]['compiled'].flags):
+                if i - start > 1:
+                    runs[start:i] = [(start, i)] * (i - start)
+                start = i
+
+    def __call__(self, text, normalize):
+        """Apply the rules against the text and return."""
+
+        rules = self._rules
+        runs = self._runs
+        fixed = False  # whether normalize(text) is known to be text
+        i = 0
+
+        while i < len(rules):
+            if not fixed:
+                fixed = '\0' not in text
+                text = normalize(text)
+                if not text:
+                    return ''
+
+            elif runs[i]:
+                found = self._first(runs[i][0], runs[i][1], i, text)
+                if found is None:
+                    i = runs[i][1]
+                    continue
+                i = found
+
+            result = rules[i]['compiled'].sub(rules[i]['replace'], text)
+            if not result:
+                return ''
+            if result != text:
+                fixed = False
+                text = result
+            i += 1
+
+        return text
+
+    def _literal(self, i):
+        """
+        Returns True if rule i leaves the text alone if it does not
+        match, i.e. it is not a regex and its replacement is plain.
+        """
+
+        rule = self._rules[i]
+        return not rule['regex'] and '\\' not in rule['replace']
+
+    def _first(self, start, end, i, text):
+        """
+        Returns the index of the first rule from i that matches the
+        text, within the subtree of rules from start to end, or None.
+        """
+
+        if end <= i or not self._finder(start, end).search(text):
+            return None
+
+        if end - start == 1:
+            return start
+
+        middle = (start + end) // 2
+        found = self._first(start, middle, i, text)
+        return self._first(middle, end, i, text) if found is None else found
+
+    def _finder(self, start, end):
+        """
+        Returns a pattern matching wherever any of the rules from start
+        to end would, i.e. their inputs merged into a trie.
+        """
+
+        if end - start == 1:
+            return self._rules[start]['compiled']
+
+        try:
+            return self._finders[start, end]
+        except KeyError:
+            pass
+
+        trie = {}
+        for rule in self._rules[start:end]:
+            node = trie
+            for char in rule['input']:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        finder = self._finders[start, end] = re.compile(
+            _aux_trie(trie),
+            self._rules[start]['compiled'].flags,
+        )
+        return finder
+
+
+class _Markup(object):  # call only, pylint:disable=R0903
+    """
+    Applies the HTML-aware rules (i.e. ruby_tags, clozes_revealed, and
+    hint_content) together in one pass over the tags of the text,
+    instead of building a BeautifulSoup tree for each of the rules.
+
+    Elements are matched up like the html.parser tree builder does:
+    an end tag closes the last open element of the same name (and all
+    opened since), stray end tags are dropped, and void elements and
+    self-closing tags do not open anything. Like the old round trip
+    through BeautifulSoup, every element that is closed gets an end
+    tag and stray brackets in the text are escaped. The text is
+    reparsed in the same cases as before: always for hint_content,
+    for ruby_tags only if "ruby" appears, and for clozes_revealed
+    only if a revealed cloze is found.
+
+    The output differs from BeautifulSoup's in three ways:
+
+    - what is kept is passed through as it was written, instead of
+      being reserialized (e.g. attributes keep their own quoting, and
+      entities such as &nbsp; are not decoded)
+    - entities in a revealed cloze stay escaped, so stripping the
+      HTML afterward does not eat "&lt;tag&gt;" or mangle "M&amp;A"
+    - an unterminated declaration (e.g. "<!DOCTYPE" with no ">") is
+      escaped and the rest is parsed, instead of being swallowed
+    """
+
+    RULES = ['ruby_tags', 'clozes_revealed', 'hint_content']
+
+    RE_CLASS = re.compile(r'(?:^|(?<=[\s"\'/]))class\s*=\s*'
+                          r'("[^"]*"|\'[^\']*\'|[^\s>]*)', re.IGNORECASE)
+
+    RE_TAG = re.compile(r'<!--.*?-->|<(/?)([a-zA-Z][^\t\n\r\f />\0]*)'
+                        r'((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>', re.DOTALL)
+
+    RAW = {'script', 'style'}  # elements whose contents are not markup
+
+    VOID = {'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command',
+            'embed', 'frame', 'hr', 'image', 'img', 'input', 'isindex',
+            'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param',
+            'source', 'spacer', 'track', 'wbr'}
+
+    __slots__ = [
+        '_hints',     # True if <div class="hint"> elements are removed
+        '_revealed',  # True if only <span class="cloze"> contents are kept
+        '_ruby',      # True if the contents of <rt> elements are removed
+        'rules',      # list of the names of the rules being applied
+    ]
+
+    def __init__(self, rules):
+        self.rules = rules
+        self._hints = 'hint_content' in rules
+        self._revealed = 'clozes_revealed' in rules
+        self._ruby = 'ruby_tags' in rules
+
+    def __call__(self, text):
+        """Apply the rules against the text and return."""
+
+        hints = self._hints
+        revealed = self._revealed and 'cloze' in text
+        ruby = self._ruby and 'ruby' in text
+        if not (hints or revealed or ruby):
+            return text
+
+        output = []    # pieces of text kept for the whole document
+        clozes = []    # lists of pieces kept for each revealed cloze
+        stack = []     # open elements, each a [name, kind, data] list
+        sinks = [output]  # lists currently receiving the kept pieces
+        dropped = 0    # number of open <rt> elements
+
+        def keep(piece):
+            """Writes piece out, unless within a dropped element."""
+
+            if not dropped:
+                for sink in sinks:
+                    sink.append(piece)
+
+        def close(depth):
+            """Closes the open elements from depth on, innermost first."""
+
+            nonlocal dropped, sinks
+
+            while len(stack) > depth:
+                name, kind, data = stack.pop()
+                if kind == 'rt':
+                    dropped -= 1
+                elif kind == 'hint':
+                    sinks = data
+                    continue
+                elif kind == 'cloze':
+                    sinks = [sink for sink in sinks if sink is not data]
+                keep('</' + name + '>')
+
+        position = 0
+        while True:
+            match = self.RE_TAG.search(text, position)
+            if not match:
+                keep(self._escape(text[position:]))
+                close(0)
+                break
+
+            keep(self._escape(text[position:match.start()]))
+            position = match.end()
+            closing, name, attrs = match.groups()
+
+            if name is None:  # comment
+                keep(match.group(0))
+                continue
+
+            name = name.lower()
+
+            if closing:
+                for depth in range(len(stack) - 1, -1, -1):
+                    if stack[depth][0] == name:
+                        break
+                else:
+                    continue  # stray end tag
+
+                close(depth)
+                continue
+
+            kind = (
+                'rt' if ruby and name == 'rt'
+                else 'hint' if hints and name == 'div' and
+                'hint' in self._classes(attrs)
+                else 'cloze' if revealed and name == 'span' and
+                'cloze' in self._classes(attrs)
+                else None
+            )
+
+            if kind != 'hint':
+                keep('<' + match.group(2) + self._escape(attrs) + '>')
+
+            if name in self.VOID or attrs.endswith('/'):
+                continue
+
+            # n.b. as if the rules ran in order, a revealed cloze within
+            # a hint is kept, but a hint within a revealed cloze is not
+            data = None
+            if kind == 'rt':
+                dropped += 1
+            elif kind == 'hint':
+                data, sinks = sinks, []
+            elif kind == 'cloze' and not dropped:
+                data = []
+                clozes.append(data)
+                sinks = sinks + [data]
+            stack.append([name, kind, data])
+
+            if name in self.RAW:
+                end = re.compile('</' + name, re.IGNORECASE) \
+                    .search(text, position)
+                end = end.start() if end else len(text)
+                keep(text[position:end])
+                position = end
+
+        if clozes:
+            return ' ... '.join(''.join(cloze) for cloze in clozes)
+        if not (hints or ruby):
+            return text  # no revealed cloze, so clozes_revealed is a no-op
+        return ''.join(output)
+
+    @staticmethod
+    def _escape(data):
+        """
+        Escapes brackets that are not part of a tag, so that stripping
+        the HTML later will not mistake them for one.
+        """
+
+        if '<' in data or '>' in data:
+            return data.replace('<', '&lt;').replace('>', '&gt;')
+        return data
+
+    def _classes(self, attrs):
+        """Returns the list of classes in the given tag attributes."""
+
+        match = None
+        for match in self.RE_CLASS.finditer(attrs):
+            pass  # html.parser keeps the last of any duplicate attributes
+
+        return match.group(1).strip('"\'').split() if match else []
+
+
+def _bind_args(method, *args):
+    """Returns a callable that passes text and then args to method."""
+
+    return lambda text: method(text, *args)
+
+
 def _aux_within(text, begin_char, end_char):
     """
     Removes any substring of text that starts with begin_char and
@@ -439,3 +930,20 @@ def _aux_within(text, begin_char, end_char):
         sequences.pop().close()
 
     return text
+
+
+def _aux_trie(node):
+    """
+    Returns a regular expression for the strings in a trie, in which
+    each node is a dict of characters to child nodes, and the empty
+    string marks the end of one of the strings.
+    """
+
+    branches = [re.escape(char) + _aux_trie(child)
+                for char, child in node.items() if char]
+
+    if not branches:
+        return ''
+
+    pattern = '(?:' + '|'.join(branches) + ')'
+    return pattern + '?' if '' in node else pattern
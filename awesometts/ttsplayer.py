@@ -10,15 +10,15 @@ import sys
 from concurrent.futures import Future
 from dataclasses import dataclass
 from typing import List, cast
-import threading
 
 import anki.sound
 from anki.lang import compatMap
 from anki.sound import AVTag, TTSTag
-from aqt import mw
+from aqt import gui_hooks, mw
 from aqt.taskman import TaskManager
 from aqt.sound import OnDoneCallback, av_player
 from aqt.tts import TTSProcessPlayer, TTSVoice
+import aqt.qt
 import aqt.utils
 import anki.utils
 
@@ -27,6 +27,9 @@ class AwesomeTTSPlayer(TTSProcessPlayer):
     def __init__(self, taskman: TaskManager, addon) -> None:
         super(TTSProcessPlayer, self).__init__(taskman)
         self._addon = addon
+        self._current = None
+        self._prefetch_busy = False
+        self._prefetch_queue = []
 
     # this is called the first time Anki tries to play a TTS file
     def get_available_voices(self) -> List[TTSVoice]:
@@ -44,41 +47,59 @@ class AwesomeTTSPlayer(TTSProcessPlayer):
 
         return voices  # type: ignore
 
-    # this is called on a background thread, and will not block the UI
-    def _play(self, tag: AVTag) -> None:
-        self.audio_file_path = None
-        self.playback_error = False
-        self.playback_error_message = None
+    # this is called on the main thread; the clip is synthesized by the router's worker threads, so
+    # nothing here blocks, and the future stands for the request until its callbacks come back
+    def play(self, tag: AVTag, on_done: OnDoneCallback) -> None:
+        self.stop()  # a request still pending is superseded by this one
 
+        future = Future()
+        self._current = future
+        # n.b. cache hits finish before the router even returns, so go through the event loop
+        future.add_done_callback(lambda future: self._taskman.run_on_main(lambda: self._on_done(future, on_done)))
+
+        try:
+            self._request(tag, future)
+        except Exception as exception:
+            if not future.done():
+                future.set_exception(exception)
+
+    def _request(self, tag: AVTag, future: Future) -> None:
         assert isinstance(tag, TTSTag)
         match = self.voice_for_tag(tag)
         assert match
         voice = match.voice
         language = voice.lang
         language_human = self._addon.language[language].lang_name
-        
+
         self._addon.logger.debug(f"playing back for language {language}, tag: {tag} text: {tag.field_text}")
 
         # is the field blank?
         if not tag.field_text.strip():
             self._addon.logger.debug("field empty, not playing anything")
+            future.set_result(None)
             return
 
-        text = tag.field_text
-
         # load awesometts preset
         tts_voices = self._addon.config['tts_voices']
         if language not in tts_voices:
             # language not configured
-            self.playback_error = True
-            self.playback_error_message = f"Language {language} ({language_human}) not configured for on-the-fly TTS, please add TTS tag in Card template editor to register this language."
+            future.set_exception(LookupError(f"Language {language} ({language_human}) not configured for on-the-fly TTS, please add TTS tag in Card template editor to register this language."))
             return
 
-        #print(f"* playing back: {self._addon.config['tts_voices'][language]}")
+        # the callbacks may arrive after the request was cancelled or superseded, and are then dropped
+        def okay(path):
+            if not future.done():
+                future.set_result(path)
+
+        def fail(exception, text):
+            if not future.done():
+                future.set_exception(RuntimeError(f"Could not play back {text}: {exception}"))
 
-        # this allows us to block until the asynchronous callback is done
-        self.done_event = threading.Event()
+        self.speak(language, tag.field_text, dict(okay=okay, fail=fail))
 
+    # sends the text of a tag to the router using the preset or group configured for its language,
+    # the same way for playback, prefetching, and warming a deck's cache
+    def speak(self, language: str, text: str, callbacks: dict) -> None:
         is_group = self._addon.config['tts_voices'][language]['is_group']
 
         # sanitize text
@@ -90,17 +111,13 @@ class AwesomeTTSPlayer(TTSProcessPlayer):
             awesometts_preset_name = self._addon.config['tts_voices'][language]['preset']
             self._addon.logger.info(f"playing back text with preset: {awesometts_preset_name}, text: {text}.")
 
-            self.awesometts_preset = awesometts_preset_name
             preset = self._addon.config['presets'][awesometts_preset_name]
 
             self._addon.router(
                 svc_id=preset['service'],
                 text=text,
                 options=preset,
-                callbacks=dict(
-                    okay=self.audio_file_ready,
-                    fail=self.failure,
-                )
+                callbacks=callbacks,
             )
 
         else:
@@ -111,60 +128,241 @@ class AwesomeTTSPlayer(TTSProcessPlayer):
             self._addon.logger.info(f"playing back text with group: {group_name}, text: {text}.")
 
             groups = self._addon.config['groups']
-            group = groups[group_name]
             if group_name not in groups:
-                self.failure(f"group {group_name} not found")
+                callbacks['fail'](f"group {group_name} not found", text)
                 return
-
-            #print(f"** playing back group {self._addon.config['tts_voices'][language]}")
+            group = groups[group_name]
 
             self._addon.router.group(
                 text=text,
                 group=group,
                 presets=self._addon.config['presets'],
-                callbacks=dict(
-                    okay=self.audio_file_ready,
-                    fail=self.failure,
-                ),
-            )    
+                callbacks=callbacks,
+            )
 
+    # this is called on the main thread whenever the reviewer shows a question, and renders the tts tags
+    # of the next few cards in the review queue in the background so that their audio is already cached
+    # by the time the student gets to them; off unless the user opts in, since with a paid cloud voice
+    # this spends quota on cards that may never be reviewed
+    def prefetch(self, card) -> None:
+        depth = self._addon.config['otf_prefetch']
+        self._prefetch_queue = []
+        if depth <= 0:
+            return
 
-        # need to wait until we get either a successful callback, or
-        self.done_event.wait(timeout=60)
+        def upcoming() -> List[TTSTag]:
+            sched = mw.col.sched
+            if not hasattr(sched, 'get_queued_cards'):
+                return []  # only the v3 scheduler can look ahead
+
+            tags = []
+            for queued_card in sched.get_queued_cards(fetch_limit=depth + 1).cards:
+                if queued_card.card.id == card.id:
+                    continue  # the card being shown right now
+                upcoming_card = mw.col.get_card(queued_card.card.id)
+                tags.extend(tag for tag in upcoming_card.question_av_tags() + upcoming_card.answer_av_tags()
+                            if isinstance(tag, TTSTag))
+            return tags
+
+        def on_done(future: Future) -> None:
+            try:
+                tags = future.result()
+            except Exception as exception:
+                self._addon.logger.warning(f"could not look ahead in the review queue: {exception}")
+                return
 
-    def failure(self, exception, text):
-        # don't do anything, can't popup any dialogs
-        # print(f"* failure: {exception}")
-        self.playback_error = True
-        self.playback_error_message = f"Could not play back {text}: {exception}"
-        self._addon.logger.error(self.playback_error_message)
-        self.done_event.set()
+            queue = self.requests(tags)
+            self._addon.logger.debug(f"prefetching {len(queue)} tts tags for upcoming cards")
+            self._prefetch_queue = queue
+            self._prefetch_next()
 
-    def audio_file_ready(self, path):
-        self._addon.logger.debug("done playing")
-        self.audio_file_path = path
-        self.done_event.set()
+        self._taskman.run_in_background(upcoming, on_done)
+
+    # returns the distinct (language, text) pairs that the given tags would have us speak(), skipping
+    # tags that another player handles, tags for languages that are not configured, and blank fields
+    def requests(self, tags: List[TTSTag]) -> List[tuple]:
+        tts_voices = self._addon.config['tts_voices']
+        requests = {}
+        for tag in tags:
+            match = self.voice_for_tag(tag)
+            if match and match.voice.lang in tts_voices and tag.field_text.strip():
+                requests[(match.voice.lang, tag.field_text)] = True
+        return list(requests)
+
+    # prefetches run one at a time (at low priority), and a newer question replaces whatever is left
+    def _prefetch_next(self) -> None:
+        if self._prefetch_busy or not self._prefetch_queue:
+            return
 
-    # this is called on the main thread, after _play finishes
-    def _on_done(self, ret: Future, cb: OnDoneCallback) -> None:
-        ret.result()
+        language, text = self._prefetch_queue.pop(0)
+        self._prefetch_busy = True
 
-        # inject file into the top of the audio queue
-        if self.audio_file_path != None:
-            av_player.insert_file(self.audio_file_path)
+        def then() -> None:
+            self._prefetch_busy = False
+            self._prefetch_next()
 
-        if self.playback_error:
-            aqt.utils.showWarning("AwesomeTTS: " + self.playback_error_message)
+        def fail(exception, text) -> None:
+            self._addon.logger.debug(f"could not prefetch {text}: {exception}")
+
+        self.speak(language, text, dict(
+            okay=lambda path: None,
+            fail=fail,
+            then=then,
+        ))
+
+    # this is called on the main thread once the request finishes, fails, or is cancelled
+    def _on_done(self, future: Future, on_done: OnDoneCallback) -> None:
+        if self._current is not future:
+            # stopped or superseded, maybe after the clip was ready but before we got here
+            self._addon.logger.debug("dropping stale playback")
+            on_done()
+            return
+        self._current = None
+
+        exception = future.exception()
+        if exception:
+            self._addon.logger.error(str(exception))
+            aqt.utils.showWarning("AwesomeTTS: " + str(exception))
+        elif future.result():
+            # inject file into the top of the audio queue
+            av_player.insert_file(future.result())
 
         # then tell player to advance, which will cause the file to be played
-        cb()
+        on_done()
+
+    # called when the user moves on (e.g. flips to the next card); a clip that is still being
+    # synthesized will still land in the cache, but will not be played late
+    def stop(self) -> None:
+        if self._current:
+            self._current.cancel()
+            self._current = None
+
+
+class DeckWarmer:
+    """
+    Renders the on-the-fly TTS tags of every card in a deck and sends them through the player's
+    preset/group path, so that the router cache has all of the deck's audio before it is reviewed.
+    """
+
+    def __init__(self, player: AwesomeTTSPlayer, addon, deck_id: int) -> None:
+        self._player = player
+        self._addon = addon
+        self._deck_id = deck_id
+        self._queue = []
+        self._inflight = 0
+        self._concurrency = 1
+        self._counts = dict(total=0, done=0, okay=0, fail=0)
+        self._cancelled = False
+
+    # rendering every card of a big deck takes a while, so it is done in the background
+    def start(self) -> None:
+        mw.progress.start(label="AwesomeTTS: reading cards...", immediate=True)
+        mw.taskman.run_in_background(self._collect, self._collected)
+
+    # this is called on a background thread
+    def _collect(self) -> List[TTSTag]:
+        card_ids = mw.col.decks.cids(self._deck_id, children=True)
+        tags = []
+        for number, card_id in enumerate(card_ids, 1):
+            card = mw.col.get_card(card_id)
+            tags.extend(tag for tag in card.question_av_tags() + card.answer_av_tags()
+                        if isinstance(tag, TTSTag))
+            if number % 100 == 0:
+                mw.taskman.run_on_main(lambda number=number: mw.progress.update(
+                    label=f"AwesomeTTS: reading cards ({number} of {len(card_ids)})...",
+                    value=number, max=len(card_ids)))
+        return tags
+
+    def _collected(self, future: Future) -> None:
+        try:
+            tags = future.result()
+        except Exception as exception:
+            mw.progress.finish()
+            aqt.utils.showWarning(f"AwesomeTTS: could not read the cards of the deck: {exception}")
+            return
+
+        self._queue = self._player.requests(tags)
+        self._counts['total'] = len(self._queue)
+
+        # the router's pool keeps each service to its own limit, so this only needs to keep enough
+        # requests in flight for the most concurrent service the deck uses
+        router = self._addon.router
+        tts_voices = self._addon.config['tts_voices']
+        presets = self._addon.config['presets']
+        svc_ids = set()
+        for language in set(language for language, _ in self._queue):
+            voice = tts_voices[language]
+            if voice['is_group']:
+                svc_ids.add('group:' + voice['group'])
+            elif voice['preset'] in presets:
+                svc_ids.add(presets[voice['preset']]['service'])
+        self._concurrency = max([router.get_concurrency(svc_id) for svc_id in svc_ids] or [1])
+
+        self._addon.logger.info(f"warming the cache with {len(self._queue)} tts tags, "
+                                f"{self._concurrency} at a time")
+        self._next()
+
+    # hands out requests until the concurrency limit is reached; called again as each one finishes
+    def _next(self) -> None:
+        if mw.progress.want_cancel():
+            self._cancelled = True
+
+        if self._cancelled or not self._queue:
+            if not self._inflight:
+                self._finish()
+            return
 
-    # we don't support stopping while the file is being downloaded
-    # (but the user can interrupt playing after it has been downloaded)
-    def stop(self):
-        pass
+        mw.progress.update(
+            label=f"AwesomeTTS: preparing audio ({self._counts['done']} of {self._counts['total']}, "
+                  f"{self._counts['fail']} failed)...",
+            value=self._counts['done'], max=self._counts['total'])
+
+        for _ in range(self._concurrency - self._inflight):
+            if not self._queue:
+                break
+            language, text = self._queue.pop(0)
+            self._inflight += 1
+            try:
+                self._player.speak(language, text, dict(
+                    okay=self._okay,
+                    fail=self._fail,
+                    then=self._then,
+                ))
+            except Exception as exception:  # e.g. a preset that has since been deleted
+                self._fail(exception, text)
+                self._then()
+
+    def _okay(self, path) -> None:
+        self._counts['okay'] += 1
+
+    def _fail(self, exception, text) -> None:
+        self._counts['fail'] += 1
+        self._addon.logger.debug(f"could not prepare {text}: {exception}")
+
+    def _then(self) -> None:
+        self._counts['done'] += 1
+        self._inflight -= 1
+        # cache hits call back right away, so go through the event loop to keep a long run of them
+        # from recursing and to let the progress dialog respond
+        aqt.qt.QTimer.singleShot(0, self._next)
+
+    def _finish(self) -> None:
+        mw.progress.finish()
+        aqt.utils.tooltip(
+            f"AwesomeTTS prepared {self._counts['okay']} of {self._counts['total']} clips"
+            + (f", {self._counts['fail']} failed" if self._counts['fail'] else "")
+            + (" (cancelled)" if self._cancelled else "") + ".",
+            period=5000)
 
 
 def register_tts_player(addon):
     # register our handler
-    av_player.players.append(AwesomeTTSPlayer(mw.taskman, addon))
+    player = AwesomeTTSPlayer(mw.taskman, addon)
+    av_player.players.append(player)
+    gui_hooks.reviewer_did_show_question.append(player.prefetch)
+
+    # offer to warm the cache from each deck's options menu on the deck browser
+    def on_options_menu(menu, deck_id: int) -> None:
+        action = menu.addAction("Prepare AwesomeTTS Audio")
+        action.triggered.connect(lambda: DeckWarmer(player, addon, deck_id).start())
+    gui_hooks.deck_browser_will_show_options_menu.append(on_options_menu)
@@ -39,9 +39,9 @@ def get_default_options(addon, svc_id):
     return options
 
 def clear_cache(cache_path):
-    for filename in os.listdir(cache_path):
-        file_path = os.path.join(cache_path, filename)
-        os.unlink(file_path)
+    for dirpath, _, filenames in os.walk(cache_path):
+        for filename in filenames:
+            os.unlink(os.path.join(dirpath, filename))
 
 class TestClass():
 
@@ -72,6 +72,7 @@ class TestClass():
         awesometts.editor_button()     # single audio clip generator button
         awesometts.reviewer_hooks()    # on-the-fly playback/shortcuts, context menus
         awesometts.temp_files()        # remove temporary files upon session exit
+        awesometts.worker_threads()    # stop background worker threads upon session exit
         # if we didn't hit any exceptions at this point, declare success
         assert True
 
@@ -200,6 +201,562 @@ class TestClass():
         assert self.addon.strip.from_note(input_text) == expected_output
         assert self.addon.strip.from_template(input_text) == expected_output                
 
+    def test_sanitizer_custom_sub(self):
+        # python -m pytest tests -rPP -k 'test_sanitizer_custom_sub'
+
+        import json
+        from awesometts.conversion import substitution_list
+        from awesometts.text import Sanitizer, _Substitutions
+
+        normalize = Sanitizer([])._normalize
+
+        def one_rule_at_a_time(rules, text):
+            # normalize, then substitute, for each rule in order
+            for rule in rules:
+                text = normalize(text)
+                if not text:
+                    return ''
+                text = rule['compiled'].sub(rule['replace'], text)
+                if not text:
+                    return ''
+            return text
+
+        rules = substitution_list(json.dumps([
+            dict(input='Mr.', replace='Mister'),
+            dict(input='dr', replace='doctor'),
+            dict(input='St', replace='street', ignore_case=False),
+            dict(input=r'(\d+)%', replace=r'\1 percent', regex=True),
+            dict(input='doctor', replace='Dr'),  # sees the output of 'dr'
+            dict(input='. . .', replace='!'),    # only before normalizing
+            dict(input='xyz', replace=''),
+            dict(input='gone', replace='   '),
+        ] + [
+            dict(input='word%d' % number, replace='W%d' % number)
+            for number in range(40)  # a long run of literal rules
+        ]))
+
+        texts = [
+            'Mr. Smith lives on Main St. and is 50% sure',
+            'DR  Who  st  ST . . .  end',
+            'word3 and word39 and word12word7 but not word',
+            'xyz',
+            'gone',
+            'a\0b  word1',
+            ' . . .  leading and trailing . . . ',
+            'nothing to change here',
+            '',
+        ]
+
+        substitutions = _Substitutions(rules)
+        for text in texts:
+            assert substitutions(text, normalize) == \
+                one_rule_at_a_time(rules, text), text
+
+        assert _Substitutions([])('  as  is  ', normalize) == '  as  is  '
+
+    def test_sanitizer_markup(self):
+        # python -m pytest tests -rPP -k 'test_sanitizer_markup'
+
+        from awesometts.text import Sanitizer, _Markup
+
+        ruby = _Markup(['ruby_tags'])
+        assert ruby('<ruby>東京<rt>とうきょう</rt></ruby>') == \
+            '<ruby>東京<rt></rt></ruby>'
+        assert ruby('<ruby>日<rt>に</rt>本<rt>ほん</rt></ruby>です') == \
+            '<ruby>日<rt></rt>本<rt></rt></ruby>です'
+        assert ruby('<ruby>a<!-- <rt>c</rt> --><rt>b</rt></ruby>') == \
+            '<ruby>a<!-- <rt>c</rt> --><rt></rt></ruby>'
+        assert ruby('no markup here') == 'no markup here'
+
+        # malformed markup is matched up as html.parser would
+        assert ruby('<ruby>x<rt>y</rt></ruby></div>') == \
+            '<ruby>x<rt></rt></ruby>'  # stray end tag dropped
+        assert ruby('<ruby>x<rt>y') == '<ruby>x<rt></rt></ruby>'
+        assert ruby('<ruby>a<rt>b</ruby>c') == '<ruby>a<rt></rt></ruby>c'
+        assert ruby('<ruby>1 < 2<rt>r</rt></ruby>') == \
+            '<ruby>1 &lt; 2<rt></rt></ruby>'
+        assert ruby('<ruby>a<<rt>b</rt></ruby>') == \
+            '<ruby>a&lt;<rt></rt></ruby>'
+
+        # unlike BeautifulSoup, which swallowed the rest of the text into
+        # an unterminated declaration, it is escaped and the rest is parsed
+        assert ruby('<!DOCTYPE ruby <rt>x</rt>') == \
+            '&lt;!DOCTYPE ruby <rt></rt>'
+
+        revealed = _Markup(['clozes_revealed'])
+        assert revealed('The <span class="cloze">capital</span> of '
+                        '<span class=cloze>France</span>') == \
+            'capital ... France'
+        assert revealed('<span class="x cloze">a<b>b</b></span> tail') == \
+            'a<b>b</b>'
+        assert revealed('<span class="cloze">abc') == 'abc'
+        assert revealed('<span class="cloze">x</b>y</span>') == 'xy'
+        assert revealed('<b>plain cloze word</b>') == '<b>plain cloze word</b>'
+        assert revealed('no span, cloze</b>') == 'no span, cloze</b>'
+
+        # unlike BeautifulSoup, entities in a revealed cloze stay escaped,
+        # so stripping the HTML afterward does not eat "<tag>" or "M&A"
+        assert revealed('<span class="cloze">&lt;tag&gt; M&amp;A</span>') == \
+            '&lt;tag&gt; M&amp;A'
+        assert Sanitizer(['clozes_revealed', 'html'])(
+            '<span class="cloze">&lt;tag&gt; M&amp;A</span>'
+        ) == '<tag> M&A'
+
+        hints = _Markup(['hint_content'])
+        assert hints('before<a class=hint href="#">Show</a><div class="hint" '
+                     'style="display: none">secret</div>after') == \
+            'before<a class=hint href="#">Show</a>after'
+        assert hints('<div class="hint">a<div>b</div>c</div>d') == 'd'
+        assert hints('hint without tags') == 'hint without tags'
+        assert hints('漢</b>字<i>漢') == '漢字<i>漢</i>'  # always reparsed
+
+        # fused, the rules apply as if run one after the other
+        fused = _Markup(['ruby_tags', 'clozes_revealed', 'hint_content'])
+        text = ('<div class="hint">hidden</div><span class="cloze">'
+                '<ruby>東京<rt>とうきょう</rt></ruby></span>')
+        assert fused(text) == hints(revealed(ruby(text))) == \
+            '<ruby>東京<rt></rt></ruby>'
+
+    def test_text_segment(self):
+        # python -m pytest tests -rPP -k 'test_text_segment'
+
+        import random
+        from awesometts.text import SPLIT_MINIMUM, SPLIT_PRIORITY, segment
+
+        separators = ''.join(''.join(symbols) for symbols in SPLIT_PRIORITY)
+
+        def rescanning_split(text, limit):
+            # the old Service.util_split(), rescanning what is left each time
+            bits = []
+            while len(text) > limit:
+                for symbols in SPLIT_PRIORITY:
+                    offsets = [offset for offset in
+                               [text.rfind(symbol, 0, limit)
+                                for symbol in symbols]
+                               if offset > SPLIT_MINIMUM]
+                    if offsets:
+                        offset = max(offsets)
+                        bits.append(text[:offset + 1].rstrip())
+                        text = text[offset + 1:]
+                        break
+                else:
+                    bits.append(text[:limit])
+                    text = text[limit:]
+                text = text.lstrip(separators)
+            bits.append(text)
+            return bits
+
+        assert segment('short', 10) == ['short']
+        assert segment('', 10) == ['']
+        assert segment('abcdefghij', 4) == ['abcd', 'efgh', 'ij']
+        assert segment('First part, second. Third part here', 25) == \
+            ['First part, second.', 'Third part here']
+        assert segment('Mr. Smith, of course, went home', 12) == \
+            ['Mr. Smith,', 'of course,', 'went home']
+        assert segment('今日は晴れです。明日は雨です。', 10) == \
+            ['今日は晴れです。', '明日は雨です。']
+
+        pieces = segment('日本語のテキストです。もう一つ', 12, encoding='utf-8')
+        assert all(len(piece.encode('utf-8')) <= 12 for piece in pieces)
+        assert ''.join(pieces) == '日本語のテキストです。もう一つ'
+
+        alphabet = 'abc   ..,,;-!?\u3002\u3001xyz'
+        generator = random.Random(1234)
+        for _ in range(500):
+            text = ''.join(generator.choice(alphabet)
+                           for _ in range(generator.randrange(120)))
+            limit = generator.randrange(1, 40)
+            assert segment(text, limit) == rescanning_split(text, limit), \
+                (text, limit)
+
+    def test_text_sentences(self):
+        # python -m pytest tests -rPP -k 'test_text_sentences'
+
+        from awesometts.text import sentences
+
+        assert sentences('One sentence only.') == ['One sentence only.']
+        assert sentences('Mr. Smith went to Washington. Pi is 3.14! '
+                         'Really?  Yes.  ') == \
+            ['Mr. Smith went to Washington.', 'Pi is 3.14!', 'Really?', 'Yes.']
+
+        # full-width terminators end even very short sentences
+        assert sentences('明日は雨。晴れ！本当？') == ['明日は雨。', '晴れ！', '本当？']
+        assert sentences('雨。 晴れ。') == ['雨。', '晴れ。']
+
+        # sentences over the limit are split further, at most limit long
+        long_sentence = 'word ' * 30 + 'end.'
+        pieces = sentences(long_sentence + ' Short one.', 40)
+        assert pieces[-1] == 'Short one.'
+        assert all(len(piece) <= 40 for piece in pieces)
+        assert ' '.join(pieces[:-1]).split() == long_sentence.split()
+
+        assert sentences('') == []
+        assert sentences('   ') == []
+
+    def test_router_segments(self):
+        # python -m pytest tests -rPP -k 'test_router_segments'
+
+        router = self.addon.router
+        text = 'First sentence here. ' * 10 + 'Last one.'
+
+        self.addon.config.update({'long_text_limit': 0,
+                                  'long_text_sentences': False})
+        assert router._segments(text) == [text]
+
+        self.addon.config.update({'long_text_limit': 50})
+        pieces = router._segments(text)
+        assert len(pieces) > 1
+        assert all(0 < len(piece) <= 50 for piece in pieces)
+        assert ' '.join(pieces).split() == text.split()
+        assert router._segments('Short.') == ['Short.']
+
+        self.addon.config.update({'long_text_limit': 0,
+                                  'long_text_sentences': True})
+        assert router._segments('One. Two three. Four!') == \
+            ['One. Two three.', 'Four!']
+
+        self.addon.config.update({'long_text_sentences': False})
+
+    def test_router_mp3_audio(self):
+        # python -m pytest tests -rPP -k 'test_router_mp3_audio'
+
+        from awesometts.router import _mp3_audio
+
+        # MPEG-1 layer III, 128 kbps, 44.1 kHz, stereo: 417-byte frames
+        header = bytes([0xff, 0xfb, 0x90, 0x00])
+        frame = header + bytes(413)
+        info = header + bytes(32) + b'Info' + bytes(377)
+        id3 = b'ID3\x04\x00\x00\x00\x00\x00\x05' + bytes(5)
+        tag = b'TAG' + bytes(125)
+
+        assert _mp3_audio(frame * 2) == frame * 2
+        assert _mp3_audio(id3 + info + frame * 2 + tag) == frame * 2
+
+        with raises(ValueError):
+            _mp3_audio(b'OggS' + bytes(100))
+        with raises(ValueError):
+            _mp3_audio(b'RIFF' + bytes(100))
+        with raises(ValueError):
+            _mp3_audio(b'')
+
+    def test_cache(self, tmp_path, monkeypatch):
+        # python -m pytest tests -rPP -k 'test_cache'
+
+        import awesometts.cache
+        from awesometts.cache import Cache
+
+        monkeypatch.setattr(awesometts.cache, 'ADOPT_BATCH', 2)
+
+        def wait_for(condition):
+            for _ in range(200):
+                if condition():
+                    return True
+                time.sleep(0.025)
+            return False
+
+        directory = tmp_path / 'cache'
+        directory.mkdir()
+        names = ['svc-%08x-0000000%d-00000000-00000000-00000000.mp3' % (n, n)
+                 for n in range(4)]
+
+        # clips from before the index, oldest first, in the flat layout
+        for number, name in enumerate(names[:3]):
+            (directory / name).write_bytes(bytes(100))
+            os.utime(directory / name, (1000 + number, 1000 + number))
+
+        budget = [0]
+        days = [365000]
+        cache = Cache(directory=str(directory),
+                      index=str(tmp_path / 'index.db'), logger=self.logger,
+                      budget=lambda: budget[0], days=lambda: days[0])
+        paths = [cache.path(name, name[4:].replace('-', '')[:40])
+                 for name in names]
+
+        # existing clips are adopted without anything being played first
+        cache.start()
+        assert wait_for(lambda: not cache.stats()['indexing'])
+        stats = cache.stats()
+        assert (stats['count'], stats['bytes'], stats['hits']) == (3, 300, 0)
+        assert all(cache.exists(path) for path in paths[:3])
+
+        # hits and additions are indexed
+        cache.hit(paths[0])
+        time.sleep(0.01)
+        with open(paths[3], 'wb') as output:
+            output.write(bytes(100))
+        cache.add(paths[3])
+        stats = cache.stats()
+        assert (stats['count'], stats['bytes'], stats['hits']) == (4, 400, 1)
+
+        # clips left unused for too long are evicted
+        days[0] = 1
+        cache._wake.set()
+        assert wait_for(lambda: cache.stats()['count'] == 2)
+        assert [os.path.exists(path) for path in paths] == \
+            [True, False, False, True]
+        assert cache.stats()['bytes'] == 200
+
+        # over budget, the least recently used clips are evicted, but
+        # never ones used within the grace period
+        budget[0] = 150
+        cache._wake.set()
+        time.sleep(0.25)
+        assert cache.stats()['count'] == 2
+        monkeypatch.setattr(awesometts.cache, 'EVICT_GRACE', 0)
+        cache._wake.set()
+        assert wait_for(lambda: cache.stats()['count'] == 1)
+        assert os.path.exists(paths[3]) and not os.path.exists(paths[0])
+
+        # the index is kept across restarts
+        cache.close()
+        assert cache.stats()['count'] == 1
+
+        assert cache.clear() == (1, 0)
+        assert cache.stats()['count'] == 0
+        days[0] = 365000
+        cache.close()
+
+    def test_failures(self, tmp_path, monkeypatch):
+        # python -m pytest tests -rPP -k 'test_failures'
+
+        import sqlite3
+        import awesometts.cache
+        from awesometts.cache import Failures
+        from awesometts.service import NotFound
+
+        now = [1000.0]
+        monkeypatch.setattr(awesometts.cache, 'time', lambda: now[0])
+        index = str(tmp_path / 'index.db')
+
+        failures = Failures(index=index, logger=self.logger, limit=3)
+        error = ValueError("quota exceeded")
+        failures.add('a.mp3', 'forvo', error, 60)
+        failures.add('b.mp3', 'forvo', error, 3600)
+        failures.add('c.mp3', 'forvo', error, 0)  # not remembered
+        assert failures.get('a.mp3') is error
+        assert failures.get('c.mp3') is None
+        assert failures.count() == 2
+        failures.add('d.mp3', 'oxford', NotFound("no such word"), 30)
+
+        # survives a restart, with the message and type kept
+        failures.close()
+        failures = Failures(index=index, logger=self.logger, limit=3)
+        assert str(failures.get('a.mp3')) == "quota exceeded"
+        assert type(failures.get('a.mp3')) is ValueError
+        assert type(failures.get('d.mp3')) is NotFound
+        assert failures.count() == 3
+        failures.add('d.mp3', 'forvo', ConnectionResetError("reset"), 30)
+        failures.close()
+        failures = Failures(index=index, logger=self.logger, limit=3)
+        assert type(failures.get('d.mp3')) is OSError  # nearest known type
+
+        # expiry
+        now[0] += 61
+        assert failures.get('a.mp3') is None
+        assert failures.get('b.mp3') is not None
+        assert failures.count() == 1
+
+        # past the size limit, the soonest to expire are dropped
+        for number, ttl in enumerate([500, 100, 300, 200]):
+            failures.add('%d.mp3' % number, 'forvo', error, ttl)
+        assert failures.count() == 3
+        assert failures.get('1.mp3') is None
+        assert failures.get('3.mp3') is None
+        assert failures.get('b.mp3') is not None
+
+        failures.clear()
+        assert failures.count() == 0
+        failures.close()
+        assert Failures(index=index, logger=self.logger).count() == 0
+
+        # failures stored without their type are read back as RuntimeError
+        index = str(tmp_path / 'old.db')
+        with sqlite3.connect(index) as conn:
+            conn.execute('CREATE TABLE failures (path TEXT PRIMARY KEY, '
+                         'service TEXT NOT NULL, expires REAL NOT NULL, '
+                         'message TEXT NOT NULL)')
+            conn.execute("INSERT INTO failures VALUES "
+                         "('a.mp3', 'forvo', 5000, 'old')")
+        conn.close()
+        failures = Failures(index=index, logger=self.logger)
+        assert type(failures.get('a.mp3')) is RuntimeError
+        failures.add('b.mp3', 'forvo', NotFound("gone"), 60)
+        failures.close()
+        assert type(Failures(index=index, logger=self.logger)
+                    .get('b.mp3')) is NotFound
+
+    def test_failure_ttl(self):
+        # python -m pytest tests -rPP -k 'test_failure_ttl'
+
+        from awesometts.service import NotFound
+
+        router = self.addon.router
+        not_found = NotFound("no such word")
+        quota = ValueError("Status code: 429")
+
+        self.addon.config.update({'failure_ttls': {}})
+        assert router.get_failure_ttl('forvo', not_found) == 86400 * 30
+        assert router.get_failure_ttl('forvo', quota) == 3600
+        assert router.get_failure_ttl('azure', quota) == 3600
+
+        # configured TTLs apply, but other errors are never kept long
+        self.addon.config.update({'failure_ttls': {'forvo': 86400}})
+        assert router.get_failure_ttl('forvo', not_found) == 86400
+        assert router.get_failure_ttl('forvo', quota) == 3600
+        self.addon.config.update({'failure_ttls': {'forvo': 60}})
+        assert router.get_failure_ttl('forvo', quota) == 60
+
+        self.addon.config.update({'failure_ttls': {}})
+
+    def test_config_write_coalescing(self, tmp_path, monkeypatch):
+        # python -m pytest tests -rPP -k 'test_config_write_coalescing'
+
+        import sqlite3
+        import awesometts.config
+        from awesometts import conversion as to
+        from awesometts.bundle import Bundle
+        from awesometts.config import Config
+
+        monkeypatch.setattr(awesometts.config, 'WRITE_DELAY', 60)
+
+        statements = []
+        logger = Bundle(debug=lambda message, *args:
+                        statements.append(args[0] if args else ''),
+                        info=lambda *args: None, error=lambda *args: None)
+
+        path = str(tmp_path / 'config.db')
+        db = Bundle(path=path, table='general', normalize=to.normalized_ascii)
+        def checked(value):
+            if value == 'bad':
+                raise ValueError(value)
+            return value
+
+        cols = [('alpha', 'integer', 1, int, int),
+                ('beta', 'text', 'b', str, str),
+                ('gamma', 'text', 'g', str, checked)]
+        seen = []
+        config = Config(db, cols, logger,
+                        events=[(['alpha'], lambda c: seen.append(c.alpha))])
+
+        def stored():
+            with sqlite3.connect(path) as conn:
+                return conn.execute('SELECT alpha, beta FROM general') \
+                    .fetchone()
+
+        assert stored() == (1, 'b')
+
+        # updates take effect in memory right away, but are held back
+        config.update(alpha=2)
+        config['beta'] = 'c'
+        config.alpha = 3
+        assert (config.alpha, config.beta, seen) == (3, 'c', [1, 2, 3])
+        assert stored() == (1, 'b')
+
+        # and then written out together, in one statement
+        del statements[:]
+        config.flush()
+        assert stored() == (3, 'c')
+        assert len([sql for sql in statements
+                    if sql.startswith('UPDATE')]) == 1
+
+        # unchanged values are not written at all
+        del statements[:]
+        config.update(alpha=3)
+        config.flush()
+        assert statements == []
+
+        # close() writes out what is pending, and the config reopens
+        config.update(beta='d')
+        config.close()
+        assert stored() == (3, 'd')
+        config.update(alpha=4)
+        config.close()
+        assert stored() == (4, 'd')
+        assert Config(db, cols, logger)['alpha'] == 4
+
+        # a failed write is rolled back and stays pending for the next one
+        config.update(alpha=5, gamma='bad')
+        config.flush()
+        assert stored() == (4, 'd')
+        config.gamma = 'ok'
+        config.flush()
+        assert stored() == (5, 'd')
+        assert Config(db, cols, logger)['gamma'] == 'ok'
+
+    def test_config_keyed(self, tmp_path):
+        # python -m pytest tests -rPP -k 'test_config_keyed'
+
+        import json
+        import sqlite3
+        from awesometts import conversion as to
+        from awesometts.bundle import Bundle
+        from awesometts.config import Config
+
+        logger = Bundle(debug=lambda *args: None, info=lambda *args: None,
+                        error=lambda *args: None, warning=lambda *args: None)
+        path = str(tmp_path / 'config.db')
+        db = Bundle(path=path, table='general', normalize=to.normalized_ascii)
+        cols = [('alpha', 'integer', 1, int, int),
+                ('presets', 'keyed', {}, to.deserialized_dict,
+                 to.compact_json),
+                ('groups', 'keyed', {'default': {'presets': []}},
+                 to.deserialized_dict, to.compact_json)]
+
+        # a database from before keyed columns, with presets in one blob
+        presets = {'Azure': {'service': 'azure', 'voice': 'en-US-Aria'},
+                   'Forvo': {'service': 'forvo', 'voice': 'en'}}
+        with sqlite3.connect(path) as conn:
+            conn.execute('CREATE TABLE general (alpha integer, presets text)')
+            conn.execute('INSERT INTO general VALUES (?, ?)',
+                         (2, json.dumps(presets)))
+        conn.close()
+
+        def stored(name):
+            with sqlite3.connect(path) as conn:
+                rows = conn.execute('SELECT key, value FROM general_%s' %
+                                    name).fetchall()
+            conn.close()
+            return {key: json.loads(value) for key, value in rows}
+
+        # the blob is moved into a table with one row per entry, and a
+        # column missing from the old row gets its default
+        config = Config(db, cols, logger)
+        assert config['alpha'] == 2
+        assert config['presets'] == presets == stored('presets')
+        assert config['groups'] == {'default': {'presets': []}} == \
+            stored('groups')
+
+        # only entries that changed are written, so a row changed behind
+        # the config's back is left alone
+        with sqlite3.connect(path) as conn:
+            conn.execute('UPDATE general_presets SET value = ? WHERE key = ?',
+                         (json.dumps({'service': 'forvo', 'voice': 'de'}),
+                          'Forvo'))
+        conn.close()
+
+        changed = dict(presets)
+        changed['Azure'] = {'service': 'azure', 'voice': 'en-GB-Ryan'}
+        changed['Google'] = {'service': 'googletts', 'voice': 'en-US'}
+        config.update(presets=changed)
+        config.flush()
+        assert stored('presets') == {
+            'Azure': {'service': 'azure', 'voice': 'en-GB-Ryan'},
+            'Forvo': {'service': 'forvo', 'voice': 'de'},
+            'Google': {'service': 'googletts', 'voice': 'en-US'},
+        }
+
+        # removed entries are deleted, and the tables are read back
+        changed = dict(changed)
+        del changed['Azure']
+        config.update(presets=changed)
+        config.close()
+        assert set(stored('presets')) == {'Forvo', 'Google'}
+
+        reloaded = Config(db, cols, logger)
+        assert set(reloaded['presets']) == {'Forvo', 'Google'}
+        assert reloaded['presets']['Forvo']['voice'] == 'de'
+        reloaded.close()
+
     def test_services(self):
         # python -m pytest tests -rPP -k 'test_services'
         """Tests all services (except services which require an API key) using a single word.